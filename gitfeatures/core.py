@@ -1,15 +1,29 @@
 import os
 import re
+import shutil
 import sys
+import base64
+import cProfile
 import datetime
+import functools
+import http.client
+import io
+import mmap
+import threading
+import time
+import uuid
 import webbrowser
-from subprocess import CalledProcessError, check_output
+from contextlib import closing, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import DEVNULL, PIPE, STDOUT, CalledProcessError, Popen, check_output
 import json
 import urllib.request
 import urllib.error
 import urllib.parse
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, Iterator, List, Set
 import jinja2  # Airflow uses Jinja2 for templating
+from jinja2 import meta
+from jinja2.sandbox import SandboxedEnvironment
 
 master_branch = os.environ.get("GITFEATURES_MASTER_BRANCH", "main")
 branch_seperator = os.environ.get("GITFEATURES_BRANCH_SEPERATOR", "_")
@@ -20,6 +34,14 @@ merge_strategy = os.environ.get("GITFEATURES_STRATEGY", "merge")
 fork_pr_strategy = os.environ.get("GITFEATURES_FORK_PR_STRATEGY", "")
 require_ticket_id = os.environ.get("GITFEATURES_REQUIRE_TICKETID", "false")
 changelog_enabled = str(os.environ.get("GITFEATURES_CHANGELOG_ENABLED", "false")).lower() in ("1", "true", "yes", "on")
+read_git_directly = str(os.environ.get("GITFEATURES_READ_GIT_DIRECTLY", "true")).lower() in ("1", "true", "yes", "on")
+linear_cache_ttl = int(os.environ.get("GITFEATURES_LINEAR_CACHE_TTL", "3600"))
+use_worktrees = str(os.environ.get("GITFEATURES_USE_WORKTREES", "false")).lower() in ("1", "true", "yes", "on")
+worktree_pool_size = max(1, int(os.environ.get("GITFEATURES_WORKTREE_POOL_SIZE", "2")))
+defer_api = str(os.environ.get("GITFEATURES_DEFER_API", "false")).lower() in ("1", "true", "yes", "on")
+api_timeout = float(os.environ.get("GITFEATURES_API_TIMEOUT", "15"))
+github_api_url = os.environ.get("GITFEATURES_GITHUB_API_URL", "https://api.github.com").rstrip("/")
+bitbucket_api_url = os.environ.get("GITFEATURES_BITBUCKET_API_URL", "https://api.bitbucket.org/2.0").rstrip("/")
 
 
 def _debug(message):
@@ -34,6 +56,236 @@ def _call(args):
         sys.exit(__name__ + ": none zero exit status executing: " + " ".join(args))  # noqa
 
 
+def _call_lines(args) -> Iterator[str]:
+    """
+    Like _call, but yield decoded stdout lines as the command produces them.
+    If the caller stops early (close the generator) the command is killed.
+    """
+    proc = Popen(args, stdout=PIPE)
+    completed = False
+    try:
+        for line in proc.stdout:
+            yield line.decode("utf-8").rstrip("\n")
+        completed = True
+    finally:
+        proc.stdout.close()
+        if not completed:
+            proc.kill()
+        returncode = proc.wait()
+    if returncode != 0:
+        sys.exit(__name__ + ": none zero exit status executing: " + " ".join(args))  # noqa
+
+
+_COMMIT_PREVIEW_LIMIT = 20
+
+
+def _summarize_commits(revisions) -> Optional[str]:
+    """
+    Return 'git log --oneline' output for revisions, or None if there are no commits.
+    Only the first _COMMIT_PREVIEW_LIMIT commits are listed, followed by a count of the
+    rest; git log is stopped as soon as that many lines have been read.
+    """
+    lines = []
+    with closing(_call_lines(["git", "log", "--oneline", *revisions])) as output:
+        for line in output:
+            lines.append(line)
+            if len(lines) > _COMMIT_PREVIEW_LIMIT:
+                break
+    if len(lines) > _COMMIT_PREVIEW_LIMIT:
+        total = int(_call(["git", "rev-list", "--count", *revisions]).strip())
+        lines = lines[:_COMMIT_PREVIEW_LIMIT] + [f"... and {total - _COMMIT_PREVIEW_LIMIT} more"]
+    return "\n".join(lines) if lines else None
+
+
+def _find_git_dirs() -> Optional[Tuple[str, str, str]]:
+    """
+    Locate the repository from the CWD without spawning git.
+    Returns (worktree root, git dir, common dir), or None when the layout is not one
+    the direct reader understands, in which case callers fall back to the git CLI.
+    """
+    if not read_git_directly:
+        return None
+    # Let git itself resolve any environment-driven repository discovery
+    if any(os.environ.get(var) for var in ("GIT_DIR", "GIT_WORK_TREE", "GIT_COMMON_DIR", "GIT_CEILING_DIRECTORIES")):
+        return None
+    path = os.getcwd()
+    if ".git" in path.split(os.sep):
+        return None
+    while True:
+        dot_git = os.path.join(path, ".git")
+        if os.path.isdir(dot_git):
+            git_dir = dot_git
+            break
+        if os.path.isfile(dot_git):
+            # Linked worktrees and submodules use a 'gitdir: <path>' file
+            try:
+                with open(dot_git, "r", encoding="utf-8") as fh:
+                    line = fh.readline().strip()
+            except OSError:
+                return None
+            if not line.startswith("gitdir:"):
+                return None
+            git_dir = os.path.normpath(os.path.join(path, line[len("gitdir:") :].strip()))
+            break
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+    common_dir = git_dir
+    try:
+        with open(os.path.join(git_dir, "commondir"), "r", encoding="utf-8") as fh:
+            common_dir = os.path.normpath(os.path.join(git_dir, fh.readline().strip()))
+    except FileNotFoundError:
+        pass
+    except OSError:
+        return None
+    if not os.path.isfile(os.path.join(git_dir, "HEAD")) or os.path.isdir(os.path.join(common_dir, "reftable")):
+        return None
+    return path, git_dir, common_dir
+
+
+def _read_head_branch() -> Optional[str]:
+    """
+    Return the branch HEAD points at by reading the HEAD file, or None if unknown/detached.
+    """
+    dirs = _find_git_dirs()
+    if not dirs:
+        return None
+    try:
+        with open(os.path.join(dirs[1], "HEAD"), "r", encoding="utf-8") as fh:
+            head = fh.read().strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if head.startswith("ref: refs/heads/"):
+        return head[len("ref: refs/heads/") :]
+    return None
+
+
+def _scan_packed_refs(mm, prefix: bytes) -> Dict[str, str]:
+    """
+    Collect refs under prefix from a memory-mapped packed-refs file.
+    Sorted files are scanned from the first match only and stop at the end of the prefix.
+    """
+    refs: Dict[str, str] = {}
+    header_end = mm.find(b"\n")
+    sorted_refs = mm[:1] == b"#" and b" sorted" in mm[: header_end if header_end != -1 else len(mm)]
+    pos = mm.find(b" " + prefix)
+    while pos != -1 and pos < len(mm):
+        start = mm.rfind(b"\n", 0, pos) + 1
+        end = mm.find(b"\n", start)
+        end = len(mm) if end == -1 else end
+        sha, _, name = mm[start:end].rstrip(b"\r").partition(b" ")
+        if name.startswith(prefix) and sha[:1] not in (b"#", b"^"):
+            refs[name.decode("utf-8")] = sha.decode("ascii")
+        elif sorted_refs and refs and sha[:1] != b"^":
+            break
+        pos = end + 1 if sorted_refs and refs else mm.find(b" " + prefix, end)
+    return refs
+
+
+def _read_packed_refs(common_dir: str, prefix: str) -> Dict[str, str]:
+    path = os.path.join(common_dir, "packed-refs")
+    try:
+        with open(path, "rb") as fh:
+            if os.fstat(fh.fileno()).st_size == 0:
+                return {}
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return _scan_packed_refs(mm, prefix.encode("utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def _read_loose_refs(common_dir: str, prefix: str) -> Dict[str, str]:
+    refs: Dict[str, str] = {}
+    base = os.path.join(common_dir, *prefix.strip("/").split("/"))
+    for dirpath, _dirnames, filenames in os.walk(base):
+        for filename in filenames:
+            if filename.endswith(".lock"):
+                continue
+            full_path = os.path.join(dirpath, filename)
+            with open(full_path, "r", encoding="utf-8") as fh:
+                value = fh.read().strip()
+            if value:
+                refs[os.path.relpath(full_path, common_dir).replace(os.sep, "/")] = value
+    return refs
+
+
+def _list_refs(prefix: str) -> Optional[Dict[str, str]]:
+    """
+    Return {refname: sha} for refs under prefix (e.g. 'refs/remotes/') by reading
+    packed-refs and loose refs directly. Symbolic refs map to 'ref: <target>'.
+    Returns None if the refs can't be read, so callers fall back to the git CLI.
+    """
+    dirs = _find_git_dirs()
+    if not dirs:
+        return None
+    common_dir = dirs[2]
+    try:
+        refs = _read_packed_refs(common_dir, prefix)
+        # Loose refs take precedence over their packed counterparts
+        refs.update(_read_loose_refs(common_dir, prefix))
+    except (OSError, ValueError) as e:
+        _debug(f"Direct ref read failed, falling back to git: {e}")
+        return None
+    return refs
+
+
+def _read_git_config(key: str) -> Optional[str]:
+    """
+    Look up a 'section.subsection.name' key in the repository's own config file.
+    Returns None when the key is absent or the file uses syntax the reader doesn't
+    handle (includes, quoting, per-worktree config), so callers fall back to git config.
+    """
+    dirs = _find_git_dirs()
+    if not dirs:
+        return None
+    _root, git_dir, common_dir = dirs
+    if os.path.exists(os.path.join(git_dir, "config.worktree")):
+        return None
+    section_path, _, wanted_name = key.rpartition(".")
+    wanted_section, _, wanted_subsection = section_path.partition(".")
+    header_re = re.compile(r'^\[\s*([A-Za-z0-9-]+)(?:\s+"([^"\\]*)")?\s*\]\s*(?:[#;].*)?$')
+    entry_re = re.compile(r"^([A-Za-z][A-Za-z0-9-]*)\s*(?:=\s*(.*))?$")
+    value = None
+    in_section = False
+    try:
+        with open(os.path.join(common_dir, "config"), "r", encoding="utf-8") as fh:
+            for raw in fh:
+                line = raw.strip()
+                if not line or line[0] in "#;":
+                    continue
+                if line.startswith("["):
+                    m = header_re.match(line)
+                    if not m or m.group(1).lower() in ("include", "includeif"):
+                        return None
+                    in_section = (
+                        m.group(1).lower() == wanted_section.lower() and (m.group(2) or "") == wanted_subsection
+                    )
+                    continue
+                m = entry_re.match(line)
+                if not m or any(ch in (m.group(2) or "") for ch in '"\\'):
+                    return None
+                if in_section and m.group(1).lower() == wanted_name.lower():
+                    value = "true" if m.group(2) is None else re.split(r"[#;]", m.group(2), 1)[0].strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+    return value
+
+
+def _get_git_common_dir() -> str:
+    dirs = _find_git_dirs()
+    if dirs:
+        return dirs[2]
+    return os.path.abspath(_call(["git", "rev-parse", "--git-common-dir"]).strip())
+
+
+def _get_origin_url() -> str:
+    origin = _read_git_config("remote.origin.url")
+    if origin is None:
+        origin = _call(["git", "config", "--get", "remote.origin.url"])
+    return origin.strip()
+
+
 def _get_repo_full_name_from_origin_url(origin_url):
     """
     Extract the 'owner/repo' full name from a git remote URL (ssh or https).
@@ -90,6 +342,9 @@ def _get_repo_root() -> str:
     """
     Return the absolute path to the git repository root, falling back to CWD.
     """
+    dirs = _find_git_dirs()
+    if dirs:
+        return dirs[0]
     try:
         root = _call(["git", "rev-parse", "--show-toplevel"]).strip()
         return root if root else os.getcwd()
@@ -128,20 +383,43 @@ def _read_changelog_template() -> Optional[str]:
     return None
 
 
-def _build_changelog_context(branch: str, ticket_identifier: Optional[str], linear_issue: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+# Context variables whose values need a Linear fetch or a git config lookup
+_LINEAR_CONTEXT_VARIABLES = {"linear", "issue", "title", "background"}
+_ORIGIN_CONTEXT_VARIABLES = {"repo_origin", "repo_full_name"}
+
+
+def _compile_changelog_template(template_text: str) -> Tuple[jinja2.Template, Set[str]]:
+    """
+    Compile the template in a sandboxed Jinja2 environment and return it together with
+    the context variables it references. Raises jinja2.TemplateError if it is invalid.
+    """
+    env = SandboxedEnvironment(autoescape=False)
+    ast = env.parse(template_text)
+    return env.from_string(ast), meta.find_undeclared_variables(ast)
+
+
+def _build_changelog_context(
+    branch: str,
+    ticket_identifier: Optional[str],
+    linear_issue: Optional[Dict[str, Any]],
+    variables: Optional[Set[str]] = None,
+) -> Dict[str, Any]:
     """
     Build a Jinja2 context for rendering user-story-template.md.
+    If variables (as returned by _compile_changelog_template) is given, inputs the
+    template doesn't reference are left empty instead of being looked up.
     """
     # Suggested fields
     title = (linear_issue.get("title") if linear_issue else "") or branch
     background = (linear_issue.get("description") if linear_issue else "") or ""
     repo_origin = ""
     repo_full_name = ""
-    try:
-        repo_origin = _call(["git", "config", "--get", "remote.origin.url"])
-        repo_full_name = _get_repo_full_name_from_origin_url(repo_origin)
-    except Exception:
-        pass
+    if variables is None or variables & _ORIGIN_CONTEXT_VARIABLES:
+        try:
+            repo_origin = _get_origin_url()
+            repo_full_name = _get_repo_full_name_from_origin_url(repo_origin)
+        except Exception:
+            pass
     # Generic issue payload for potential multiple providers
     issue: Dict[str, Any] = {}
     if linear_issue:
@@ -165,7 +443,7 @@ def _build_changelog_context(branch: str, ticket_identifier: Optional[str], line
     context = {
         "branch": branch,
         "ticket": ticket_identifier,
-        "repo_origin": repo_origin.strip(),
+        "repo_origin": repo_origin,
         "repo_full_name": repo_full_name,
         "linear": linear_issue or {},
         "issue": issue,
@@ -179,12 +457,11 @@ def _build_changelog_context(branch: str, ticket_identifier: Optional[str], line
     return context
 
 
-def _render_changelog_template(template_text: str, context: Dict[str, Any]) -> Optional[str]:
+def _render_changelog_template(template: jinja2.Template, context: Dict[str, Any]) -> Optional[str]:
     """
-    Render the provided template text with Jinja2 using the given context.
+    Render a template compiled by _compile_changelog_template using the given context.
     """
     try:
-        template = jinja2.Template(template_text, autoescape=False)
         return template.render(**context)
     except Exception as e:
         _debug(f"Jinja2 render failed: {e}")
@@ -218,10 +495,13 @@ def _extract_linear_team_and_number(identifier: str) -> Optional[Tuple[str, int]
     return None
 
 
-def _fetch_linear_issue(team_key: str, number: int, token: str) -> Optional[Dict[str, Any]]:
+def _fetch_linear_issue(
+    team_key: str, number: int, token: str, raise_errors: bool = False
+) -> Optional[Dict[str, Any]]:
     """
     Fetch a Linear issue by team key and issue number using GraphQL.
     Returns a dict with identifier, title, description, url on success; else None.
+    With raise_errors, request failures are raised instead of logged (None still means not found).
     """
     endpoint = "https://api.linear.app/graphql"
     query = """
@@ -248,7 +528,6 @@ def _fetch_linear_issue(team_key: str, number: int, token: str) -> Optional[Dict
     """
     # Linear's schema expects number as a Float
     payload = {"query": query, "variables": {"teamKey": team_key, "number": float(number)}}
-    data = json.dumps(payload).encode("utf-8")
     # Linear expects the API key directly in the Authorization header (no 'Bearer ' prefix)
     auth_value = (token or "").strip()
     if auth_value.lower().startswith("bearer "):
@@ -258,84 +537,574 @@ def _fetch_linear_issue(team_key: str, number: int, token: str) -> Optional[Dict
         "Content-Type": "application/json",
         "User-Agent": "gitfeatures",
     }
-    req = urllib.request.Request(endpoint, data=data, headers=headers, method="POST")
     try:
-        with urllib.request.urlopen(req) as resp:
-            resp_body = resp.read().decode("utf-8")
-            parsed = json.loads(resp_body)
-            nodes = (((parsed or {}).get("data") or {}).get("issues") or {}).get("nodes") or []
-            if nodes:
-                node = nodes[0]
-                labels_nodes = (((node or {}).get("labels") or {}).get("nodes")) or []
-                labels = [{"id": it.get("id"), "name": it.get("name"), "color": it.get("color")} for it in labels_nodes]
-                state = node.get("state") or {}
-                team = node.get("team") or {}
-                assignee = node.get("assignee") or {}
-                return {
-                    "identifier": node.get("identifier"),
-                    "number": node.get("number"),
-                    "title": node.get("title"),
-                    "description": node.get("description") or "",
-                    "url": node.get("url"),
-                    "createdAt": node.get("createdAt"),
-                    "updatedAt": node.get("updatedAt"),
-                    "priority": node.get("priority"),
-                    "estimate": node.get("estimate"),
-                    "team": {"key": team.get("key"), "name": team.get("name"), "id": team.get("id")},
-                    "state": {"name": state.get("name"), "type": state.get("type"), "color": state.get("color"), "id": state.get("id")},
-                    "assignee": {
-                        "id": assignee.get("id"),
-                        "name": assignee.get("name"),
-                        "displayName": assignee.get("displayName"),
-                        "email": assignee.get("email"),
-                    },
-                    "labels": labels,
-                }
+        parsed = _http_request("POST", endpoint, headers, payload)
+        nodes = (((parsed or {}).get("data") or {}).get("issues") or {}).get("nodes") or []
+        if nodes:
+            node = nodes[0]
+            labels_nodes = (((node or {}).get("labels") or {}).get("nodes")) or []
+            labels = [{"id": it.get("id"), "name": it.get("name"), "color": it.get("color")} for it in labels_nodes]
+            state = node.get("state") or {}
+            team = node.get("team") or {}
+            assignee = node.get("assignee") or {}
+            return {
+                "identifier": node.get("identifier"),
+                "number": node.get("number"),
+                "title": node.get("title"),
+                "description": node.get("description") or "",
+                "url": node.get("url"),
+                "createdAt": node.get("createdAt"),
+                "updatedAt": node.get("updatedAt"),
+                "priority": node.get("priority"),
+                "estimate": node.get("estimate"),
+                "team": {"key": team.get("key"), "name": team.get("name"), "id": team.get("id")},
+                "state": {"name": state.get("name"), "type": state.get("type"), "color": state.get("color"), "id": state.get("id")},
+                "assignee": {
+                    "id": assignee.get("id"),
+                    "name": assignee.get("name"),
+                    "displayName": assignee.get("displayName"),
+                    "email": assignee.get("email"),
+                },
+                "labels": labels,
+            }
     except urllib.error.HTTPError as e:
+        if raise_errors:
+            raise
         try:
             err_body = e.read().decode("utf-8")
         except Exception:
             err_body = str(e)
         _debug(f"Linear API error: {err_body}")
     except Exception as e:
+        if raise_errors:
+            raise
         _debug(f"Linear API exception: {e}")
     return None
 
 
+def _get_linear_token() -> Optional[str]:
+    return os.environ.get("LINEAR_API_KEY") or os.environ.get("LINEAR_TOKEN")
+
+
+def _get_github_token() -> Optional[str]:
+    return os.environ.get("GITHUB_TOKEN") or os.environ.get("GH_TOKEN")
+
+
+def _get_bitbucket_token() -> Optional[str]:
+    """
+    Return a Bitbucket access token, or 'username:app_password' for basic auth.
+    """
+    token = os.environ.get("BITBUCKET_TOKEN")
+    if token:
+        return token
+    username = os.environ.get("BITBUCKET_USERNAME")
+    app_password = os.environ.get("BITBUCKET_APP_PASSWORD")
+    if username and app_password:
+        return f"{username}:{app_password}"
+    return None
+
+
+def _fetch_linear_issue_for_ticket(
+    ticket_identifier: Optional[str], raise_errors: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Fetch the Linear issue for a ticket id like 'ENG-123' if a Linear token is configured.
+    """
+    linear_token = _get_linear_token()
+    if linear_token and ticket_identifier:
+        parsed = _extract_linear_team_and_number(ticket_identifier)
+        if parsed:
+            team_key, number = parsed
+            return _fetch_linear_issue(team_key, number, linear_token, raise_errors)
+    return None
+
+
 # Removed inline initial changelog builder in favor of bundled Jinja2 template
 
 
-def _create_github_pr_with_token(repo_full_name, head_branch, base_branch, body_text, token):
+_http_connections = threading.local()
+
+
+def _http_request(method: str, url: str, headers: Dict[str, str], payload: Optional[Dict[str, Any]] = None) -> Any:
     """
-    Create a GitHub Pull Request using the REST API.
-    Returns (success, response_json or error_text).
+    Send a JSON API request and return the parsed response, reusing one kept-alive
+    connection per host and thread. Failures raise urllib.error.HTTPError/URLError
+    just like urlopen, so callers can handle both the same way.
+    """
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    parts = urllib.parse.urlsplit(url)
+    if urllib.request.getproxies().get(parts.scheme):
+        # http.client doesn't honour proxy settings; let urllib deal with them
+        req = urllib.request.Request(url, data=data, headers=headers, method=method)
+        with urllib.request.urlopen(req, timeout=api_timeout) as resp:
+            body = resp.read()
+        return json.loads(body.decode("utf-8")) if body else {}
+    pool = getattr(_http_connections, "pool", None)
+    if pool is None:
+        pool = _http_connections.pool = {}
+    key = (parts.scheme, parts.netloc)
+    target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    while True:
+        reused = key in pool
+        if not reused:
+            conn_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+            pool[key] = conn_class(parts.netloc, timeout=api_timeout)
+        conn = pool[key]
+        try:
+            conn.request(method, target, body=data, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+            break
+        except (http.client.HTTPException, OSError) as e:
+            conn.close()
+            del pool[key]
+            # The server may have closed an idle kept-alive connection; retry once on a fresh one
+            if not (reused and isinstance(e, ConnectionError)):
+                raise urllib.error.URLError(e)
+    # Redirects (e.g. a renamed repository) aren't followed, so they are errors too
+    if not 200 <= resp.status < 300:
+        raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, io.BytesIO(body))
+    return json.loads(body.decode("utf-8")) if body else {}
+
+
+def _github_request(method: str, path: str, token: str, payload: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Send a GitHub REST API request and return the parsed JSON response.
+    Raises urllib.error.HTTPError/URLError on failure.
     """
-    api_url = f"https://api.github.com/repos/{repo_full_name}/pulls"
-    title = head_branch
-    payload = {"title": title, "head": head_branch, "base": base_branch, "draft": True}
-    if body_text:
-        payload["body"] = body_text
-    data = json.dumps(payload).encode("utf-8")
     headers = {
         "Authorization": f"token {token}",
         "Accept": "application/vnd.github+json",
         "User-Agent": "gitfeatures",
         "Content-Type": "application/json",
     }
-    req = urllib.request.Request(api_url, data=data, headers=headers, method="POST")
+    return _http_request(method, github_api_url + path, headers, payload)
+
+
+def _github_pr_payload(head_branch, base_branch, body_text) -> Dict[str, Any]:
+    payload = {"title": head_branch, "head": head_branch, "base": base_branch, "draft": True}
+    if body_text:
+        payload["body"] = body_text
+    return payload
+
+
+def _github_create_pr(repo_full_name, head_branch, base_branch, body_text, token) -> Dict[str, Any]:
+    payload = _github_pr_payload(head_branch, base_branch, body_text)
+    return _github_request("POST", f"/repos/{repo_full_name}/pulls", token, payload)
+
+
+def _github_find_open_pr(repo_full_name, head_branch, token) -> Optional[Dict[str, Any]]:
+    query = urllib.parse.urlencode({"head": f"{repo_full_name.split('/', 1)[0]}:{head_branch}", "state": "open"})
+    pulls = _github_request("GET", f"/repos/{repo_full_name}/pulls?{query}", token)
+    if not pulls:
+        return None
+    pr = pulls[0]
+    return {"id": pr["number"], "title": pr.get("title"), "body": pr.get("body"), "html_url": pr.get("html_url")}
+
+
+def _github_update_pr_body(repo_full_name, pr, body_text, token):
+    _github_request("PATCH", f"/repos/{repo_full_name}/pulls/{pr['id']}", token, {"body": body_text or ""})
+
+
+def _bitbucket_request(method: str, path: str, token: str, payload: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Send a Bitbucket Cloud REST API request and return the parsed JSON response.
+    Raises urllib.error.HTTPError/URLError on failure.
+    """
+    if ":" in token:
+        auth = "Basic " + base64.b64encode(token.encode("utf-8")).decode("ascii")
+    else:
+        auth = f"Bearer {token}"
+    headers = {
+        "Authorization": auth,
+        "Accept": "application/json",
+        "User-Agent": "gitfeatures",
+        "Content-Type": "application/json",
+    }
+    return _http_request(method, bitbucket_api_url + path, headers, payload)
+
+
+def _bitbucket_pr_summary(pr: Dict[str, Any]) -> Dict[str, Any]:
+    html_url = (((pr.get("links") or {}).get("html")) or {}).get("href")
+    return dict(pr, body=pr.get("description"), html_url=html_url)
+
+
+def _bitbucket_create_pr(repo_full_name, head_branch, base_branch, body_text, token) -> Dict[str, Any]:
+    payload = {
+        "title": head_branch,
+        "source": {"branch": {"name": head_branch}},
+        "destination": {"branch": {"name": base_branch}},
+        "draft": True,
+    }
+    if body_text:
+        payload["description"] = body_text
+    resp = _bitbucket_request("POST", f"/repositories/{repo_full_name}/pullrequests", token, payload)
+    return _bitbucket_pr_summary(resp)
+
+
+def _bitbucket_find_open_pr(repo_full_name, head_branch, token) -> Optional[Dict[str, Any]]:
+    query = urllib.parse.urlencode({"q": f'source.branch.name="{head_branch}" AND state="OPEN"'})
+    resp = _bitbucket_request("GET", f"/repositories/{repo_full_name}/pullrequests?{query}", token)
+    values = resp.get("values") or []
+    if not values:
+        return None
+    return _bitbucket_pr_summary(values[0])
+
+
+def _bitbucket_update_pr_body(repo_full_name, pr, body_text, token):
+    payload = {"title": pr.get("title"), "description": body_text or ""}
+    _bitbucket_request("PUT", f"/repositories/{repo_full_name}/pullrequests/{pr['id']}", token, payload)
+
+
+# Pull request backends keyed by GITFEATURES_REPO. Each create/find/update function
+# raises urllib errors; body and html_url are normalised on the PRs they return.
+_PR_PROVIDERS: Dict[str, Dict[str, Any]] = {
+    "github": {
+        "token": _get_github_token,
+        "token_name": "GITHUB_TOKEN",
+        "create": _github_create_pr,
+        "find_open": _github_find_open_pr,
+        "update_body": _github_update_pr_body,
+    },
+    "bitbucket": {
+        "token": _get_bitbucket_token,
+        "token_name": "BITBUCKET_TOKEN",
+        "create": _bitbucket_create_pr,
+        "find_open": _bitbucket_find_open_pr,
+        "update_body": _bitbucket_update_pr_body,
+    },
+}
+
+
+# Statuses the providers answer PR creation with when the head branch already has a PR
+# (GitHub 422, Bitbucket 400/409)
+_PR_EXISTS_STATUSES = (400, 409, 422)
+
+
+def _create_pr_with_token(provider, repo_full_name, head_branch, base_branch, body_text, token):
+    """
+    Create a Pull Request using the provider's REST API.
+    Returns (success, response_json or the exception raised).
+    """
+    try:
+        return True, _PR_PROVIDERS[provider]["create"](repo_full_name, head_branch, base_branch, body_text, token)
+    except Exception as e:
+        return False, e
+
+
+def _find_open_pr_with_token(provider, repo_full_name, head_branch, token) -> Optional[Dict[str, Any]]:
+    """
+    Return the open PR for head_branch, or None if there is none or the lookup fails.
+    """
+    try:
+        return _PR_PROVIDERS[provider]["find_open"](repo_full_name, head_branch, token)
+    except Exception as e:
+        _debug(f"{provider} API error looking up open PR: {e}")
+        return None
+
+
+_OUTBOX_MAX_ATTEMPTS = 4
+
+
+class _PermanentApiError(Exception):
+    """
+    A queued operation that can never succeed; it is dropped from the outbox.
+    """
+
+
+class _MissingTokenError(Exception):
+    """
+    A queued operation that can't run until an API token is configured; it stays queued.
+    """
+
+
+def _get_outbox_path() -> str:
+    return os.path.join(_get_git_common_dir(), "gitfeatures", "outbox.jsonl")
+
+
+@contextmanager
+def _file_lock(path: str, timeout: float = 10.0):
+    """
+    Hold an exclusive lock file for the duration of the block.
+    """
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.time() >= deadline:
+                sys.exit(__name__ + f": {path} is locked, remove it if no other gitfeatures command is running")
+            time.sleep(0.05)
     try:
-        with urllib.request.urlopen(req) as resp:
-            resp_body = resp.read().decode("utf-8")
-            parsed = json.loads(resp_body)
-            return True, parsed
+        yield
+    finally:
+        os.close(fd)
+        os.remove(path)
+
+
+def _append_outbox(path: str, records: List[Dict[str, Any]]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _file_lock(path + ".lock"):
+        with open(path, "a", encoding="utf-8") as fh:
+            for record in records:
+                fh.write(json.dumps(record) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+
+
+def _enqueue_api_operation(op: str, args: Dict[str, Any]) -> str:
+    """
+    Append a pending API operation to the outbox journal for `git features sync` to replay.
+    """
+    entry = {"id": uuid.uuid4().hex, "op": op, "args": args, "queued_at": time.time()}
+    _append_outbox(_get_outbox_path(), [entry])
+    _debug(f"Queued {op} ({entry['id']})")
+    return entry["id"]
+
+
+def _read_outbox(path: str) -> List[Dict[str, Any]]:
+    """
+    Return queued operations without a completion record, in journal order.
+    """
+    entries: Dict[str, Dict[str, Any]] = {}
+    finished = set()
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn line from an interrupted append
+                    continue
+                if "op" in record:
+                    entries[record["id"]] = record
+                elif record.get("status") in ("done", "failed"):
+                    finished.add(record["id"])
+    except FileNotFoundError:
+        return []
+    return [entry for entry_id, entry in entries.items() if entry_id not in finished]
+
+
+def _compact_outbox(path: str):
+    with _file_lock(path + ".lock"):
+        pending = _read_outbox(path)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            for entry in pending:
+                fh.write(json.dumps(entry) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+
+
+def _read_http_error(e: urllib.error.HTTPError) -> str:
+    try:
+        return e.read().decode("utf-8")
+    except Exception:
+        return str(e)
+
+
+def _is_transient_api_error(e: Exception) -> bool:
+    if isinstance(e, urllib.error.HTTPError):
+        return e.code == 429 or e.code >= 500
+    # URLError and socket timeouts are both OSErrors
+    return isinstance(e, OSError)
+
+
+def _get_replay_provider(args: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    provider = _PR_PROVIDERS.get(args.get("provider", "github"))
+    if not provider:
+        raise _PermanentApiError(f"unsupported provider {args.get('provider')}")
+    token = provider["token"]()
+    if not token:
+        raise _MissingTokenError(f"{provider['token_name']} is not set")
+    return provider, token
+
+
+def _replay_create_pr(args: Dict[str, Any]) -> str:
+    provider, token = _get_replay_provider(args)
+    try:
+        resp = provider["create"](args["repo_full_name"], args["head"], args["base"], args.get("body"), token)
     except urllib.error.HTTPError as e:
+        # Creating a PR for a head that already has one is rejected; refresh its body instead
+        if e.code in _PR_EXISTS_STATUSES and args.get("body"):
+            pr = provider["find_open"](args["repo_full_name"], args["head"], token)
+            if pr:
+                return _replay_update_pr_body(args, pr)
+        raise
+    return f"Created PR: {resp.get('html_url')}"
+
+
+def _replay_update_pr_body(args: Dict[str, Any], pr: Optional[Dict[str, Any]] = None) -> str:
+    provider, token = _get_replay_provider(args)
+    if pr is None:
+        pr = provider["find_open"](args["repo_full_name"], args["head"], token)
+    if not pr:
+        raise _PermanentApiError(f"no open PR for {args['head']}")
+    provider["update_body"](args["repo_full_name"], pr, args.get("body"), token)
+    return f"Updated PR body: {pr.get('html_url')}"
+
+
+def _replay_refresh_changelog(args: Dict[str, Any]) -> str:
+    """
+    Re-render a changelog created without Linear data, unless it was edited since.
+    """
+    if not _get_linear_token():
+        raise _MissingTokenError("LINEAR_API_KEY is not set")
+    issue = _fetch_linear_issue_for_ticket(args["ticket"], raise_errors=True)
+    if not issue:
+        raise _PermanentApiError(f"Linear issue {args['ticket']} not found")
+    path = args["path"]
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            current = fh.read()
+    except FileNotFoundError:
+        raise _PermanentApiError(f"{path} no longer exists")
+    if current != args.get("rendered", ""):
+        raise _PermanentApiError(f"{path} was edited since it was created, left unchanged")
+    template, variables = _compile_changelog_template(_read_changelog_template() or "")
+    context = _build_changelog_context(args["branch"], args["ticket"], issue, variables)
+    rendered = _render_changelog_template(template, context)
+    if rendered is None:
+        raise _PermanentApiError("failed to render changelog template")
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(rendered)
+    return f"Updated {path} from {args['ticket']}"
+
+
+_OUTBOX_HANDLERS = {
+    "create_pr": _replay_create_pr,
+    "update_pr_body": _replay_update_pr_body,
+    "refresh_changelog": _replay_refresh_changelog,
+}
+
+
+def _replay_api_operation(entry: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Run one queued operation, retrying transient network errors with backoff.
+    Returns (status, message): 'done', 'failed' (permanent, dropped) or 'pending' (kept).
+    """
+    handler = _OUTBOX_HANDLERS.get(entry.get("op"))
+    if not handler:
+        return "failed", f"unknown operation {entry.get('op')}"
+    error: Exception = RuntimeError("not attempted")
+    for attempt in range(_OUTBOX_MAX_ATTEMPTS):
         try:
-            err_body = e.read().decode("utf-8")
-        except Exception:
-            err_body = str(e)
-        return False, err_body
-    except Exception as e:
-        return False, str(e)
+            return "done", handler(entry.get("args") or {})
+        except _PermanentApiError as e:
+            return "failed", str(e)
+        except _MissingTokenError as e:
+            return "pending", str(e)
+        except urllib.error.HTTPError as e:
+            if not _is_transient_api_error(e):
+                return "failed", f"HTTP {e.code}: {_read_http_error(e)}"
+            error = e
+        except Exception as e:
+            # Anything else (a malformed entry, a broken template) won't fix itself on retry
+            if not _is_transient_api_error(e):
+                return "failed", f"{type(e).__name__}: {e}"
+            error = e
+        if attempt + 1 < _OUTBOX_MAX_ATTEMPTS:
+            time.sleep(0.5 * 2**attempt)
+    return "pending", f"gave up after {_OUTBOX_MAX_ATTEMPTS} attempts: {error}"
+
+
+def _update_master_ref() -> bool:
+    """
+    Fast-forward the local base branch to origin/<base> without checking it out.
+    Returns False if the ref can't be fast-forwarded (e.g. it has local commits).
+    """
+    try:
+        check_output(["git", "fetch", ".", f"origin/{master_branch}:{master_branch}"], stderr=STDOUT)
+        return True
+    except CalledProcessError as e:
+        _debug(f"Unable to fast-forward {master_branch}: {e.output.decode('utf-8', 'replace')}")
+        return False
+
+
+def _prune_worktree_pool(pool_dir: str):
+    """
+    Drop worktrees git no longer knows about and slots beyond the configured pool size.
+    """
+    _call(["git", "worktree", "prune"])
+    for entry in os.listdir(pool_dir):
+        match = re.fullmatch(r"pool-(\d+)", entry)
+        if match and int(match.group(1)) >= worktree_pool_size:
+            path = os.path.join(pool_dir, entry)
+            try:
+                check_output(["git", "worktree", "remove", "--force", path], stderr=STDOUT)
+            except CalledProcessError as e:
+                _debug(f"Unable to remove worktree {path}: {e.output.decode('utf-8', 'replace')}")
+
+
+@contextmanager
+def _pooled_worktree(commit: str, timeout: float = 60.0) -> Iterator[str]:
+    """
+    Check out commit in a free detached worktree from a small pool shared by all branches.
+    Pool worktrees are kept between runs so only the files that changed are rewritten.
+    """
+    pool_dir = os.path.join(_get_git_common_dir(), "gitfeatures", "worktrees")
+    os.makedirs(pool_dir, exist_ok=True)
+    deadline = time.time() + timeout
+    while True:
+        for slot in range(worktree_pool_size):
+            path = os.path.join(pool_dir, f"pool-{slot}")
+            try:
+                fd = os.open(path + ".lock", os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue
+            try:
+                if os.path.exists(os.path.join(path, ".git")):
+                    _call(["git", "-C", path, "checkout", "--quiet", "--force", "--detach", commit])
+                else:
+                    # A leftover directory without its .git file can't be reused
+                    shutil.rmtree(path, ignore_errors=True)
+                    _prune_worktree_pool(pool_dir)
+                    _call(["git", "worktree", "add", "--quiet", "--detach", path, commit])
+                yield path
+            finally:
+                os.close(fd)
+                os.remove(path + ".lock")
+            return
+        if time.time() >= deadline:
+            sys.exit(
+                __name__ + f": all worktrees in {pool_dir} are locked, remove the .lock files if no other gitfeatures "
+                "command is running"
+            )
+        time.sleep(0.1)
+
+
+def _update_branch_in_worktree(branch: str) -> bool:
+    """
+    Merge or rebase the base branch into branch inside a pooled worktree, then move
+    branch to the result in the user's checkout. Returns False if conflicts occurred.
+    """
+    head = _call(["git", "rev-parse", branch]).strip()
+    with _pooled_worktree(head) as path:
+        if merge_strategy == "rebase":
+            cmd = ["git", "-C", path, "rebase", master_branch]
+        else:
+            message = f"Merge branch '{master_branch}' into {branch}"
+            cmd = ["git", "-C", path, "merge", "--no-edit", "-m", message, master_branch]
+        print("git {} {}".format(merge_strategy, master_branch))
+        try:
+            print(check_output(cmd).decode("utf-8"))
+        except CalledProcessError as e:
+            # Never leave a half-finished merge/rebase behind in a shared worktree
+            try:
+                check_output(["git", "-C", path, merge_strategy, "--abort"], stderr=STDOUT)
+            except CalledProcessError:
+                pass
+            if b"CONFLICT" not in e.output:
+                raise
+            return False
+        result = _call(["git", "-C", path, "rev-parse", "HEAD"]).strip()
+    if merge_strategy == "rebase":
+        _call(["git", "reset", "--keep", result])
+    else:
+        _call(["git", "merge", "--ff-only", result])
+    return True
 
 
 def _get_branch_name(prefix, name, ticket_id=None):
@@ -400,6 +1169,16 @@ def new_feature(name, prefix, ticket_id=None):
     if _branch_exists(new_branch):
         sys.exit(__name__ + ": local or remote branch already exists: " + new_branch)  # noqa
 
+    changelog_template = None
+    if changelog_enabled:
+        # Validate the template before the branch is created and pushed
+        template_text = _read_changelog_template()
+        if template_text:
+            try:
+                changelog_template = _compile_changelog_template(template_text)
+            except jinja2.TemplateError as e:
+                sys.exit(__name__ + f": invalid changelog template ({e}), run git changelog --check for details")
+
     _call(["git", "checkout", "-b", new_branch])
     _call(["git", "push", "-u", "origin", new_branch + ":" + new_branch])
     # Create changelog file for this branch if feature is enabled and file not present
@@ -410,26 +1189,35 @@ def new_feature(name, prefix, ticket_id=None):
             if parent_dir and not os.path.exists(parent_dir):
                 os.makedirs(parent_dir, exist_ok=True)
             if not os.path.exists(changelog_path):
-                # Optionally fetch Linear issue to prefill context
-                linear_issue = None
-                linear_token = os.environ.get("LINEAR_API_KEY") or os.environ.get("LINEAR_TOKEN")
-                if linear_token and detected_ticket_identifier:
-                    parsed = _extract_linear_team_and_number(detected_ticket_identifier)
-                    if parsed:
-                        team_key, number = parsed
-                        linear_issue = _fetch_linear_issue(team_key, number, linear_token)
                 # Render changelog from dedicated changelog template
                 initial_body = ""
-                changelog_template = _read_changelog_template()
+                defer_linear = False
                 if changelog_template:
-                    context = _build_changelog_context(new_branch, detected_ticket_identifier, linear_issue)
-                    rendered = _render_changelog_template(changelog_template, context)
+                    template, variables = changelog_template
+                    # Only fetch the Linear issue if the template uses it
+                    linear_issue = None
+                    if variables & _LINEAR_CONTEXT_VARIABLES:
+                        if defer_api and detected_ticket_identifier and _get_linear_token():
+                            defer_linear = True
+                        else:
+                            linear_issue = _fetch_linear_issue_for_ticket(detected_ticket_identifier)
+                    context = _build_changelog_context(new_branch, detected_ticket_identifier, linear_issue, variables)
+                    rendered = _render_changelog_template(template, context)
                     if rendered is not None:
                         initial_body = rendered
                 # If no template or render fails, create empty file (no default)
                 with open(changelog_path, "w", encoding="utf-8") as fh:
                     fh.write(initial_body)
                 _debug(f"Created changelog file: {changelog_path}")
+                if defer_linear:
+                    op_args = {
+                        "branch": new_branch,
+                        "ticket": detected_ticket_identifier,
+                        "path": os.path.abspath(changelog_path),
+                        "rendered": initial_body,
+                    }
+                    _enqueue_api_operation("refresh_changelog", op_args)
+                    print("Queued Linear lookup for the changelog, run git features sync to fill it in")
         except Exception as e:
             _debug(f"Unable to create changelog file: {e}")
 
@@ -439,17 +1227,19 @@ def finish_feature(name, prefix):
 
     if name:
         branch = _get_branch_name(prefix, name)
-        if branch == cur_branch:
-            _call(["git", "checkout", master_branch])
     elif cur_branch != master_branch:
         branch = cur_branch
-        _call(["git", "checkout", master_branch])
     else:
         sys.exit(__name__ + ": please provide a branch name if on {}".format(master_branch))
 
     _call(["git", "remote", "update", "origin"])
+    if branch == cur_branch:
+        # Fast-forward the base ref first so the single checkout lands on the up to date tree
+        if use_worktrees:
+            _update_master_ref()
+        _call(["git", "checkout", master_branch])
 
-    commits = _call(["git", "log", "--oneline", branch, "^origin/{}".format(master_branch)])
+    commits = _summarize_commits([branch, "^origin/{}".format(master_branch)])
     if commits:
         sys.exit(
             __name__
@@ -457,7 +1247,7 @@ def finish_feature(name, prefix):
             + branch
             + " contains commits that are not in {}:\n".format(master_branch)
             + commits
-            + "\nraise a pull request and get them merged in."
+            + "\n\nraise a pull request and get them merged in."
         )
     else:
         _call(["git", "push", "origin", ":" + branch])
@@ -522,7 +1312,7 @@ def pullrequest(args):
 
     # check its up to date with remote master if not pull
     _call(["git", "remote", "update", "origin"])
-    commits = _call(["git", "log", "--oneline", "^" + branch, "origin/{}".format(master_branch)])
+    commits = _summarize_commits(["^" + branch, "origin/{}".format(master_branch)])
     if commits:
         print(
             "Your branch is behind origin/{} so cannot be automatically {}d.".format(master_branch, merge_strategy)
@@ -534,26 +1324,39 @@ def pullrequest(args):
             )
         )  # noqa
         if input().lower() == "y":
-            _call(["git", "checkout", master_branch])
-            _call(["git", "pull"])
-            _call(["git", "checkout", branch])
-            try:
-                print("git {} {}".format(merge_strategy, master_branch))
-                output = check_output(["git", merge_strategy, master_branch]).decode("utf-8")
-                print(output)
+            updated = False
+            if use_worktrees and _update_master_ref():
+                # Update without rewriting the working tree; only conflicts are resolved in place
+                updated = _update_branch_in_worktree(branch)
+                if not updated:
+                    print(
+                        "Conflicts found, running {} in your working tree so you can fix them".format(merge_strategy)
+                    )
+            else:
+                _call(["git", "checkout", master_branch])
+                _call(["git", "pull"])
+                _call(["git", "checkout", branch])
+            if updated:
                 print("Congratulations, successfully {}d {}".format(merge_strategy, master_branch))
-            except CalledProcessError as e:
-                if b"CONFLICT" in e.output:
-                    err = (
-                        e.output.decode()
-                        + " \n\nUnlucky! You have work to do. Fix the above conflicts and run git pullrequest again"
-                    )  # noqa
-                    sys.exit(err)
-                else:
-                    raise
+            else:
+                try:
+                    print("git {} {}".format(merge_strategy, master_branch))
+                    output = check_output(["git", merge_strategy, master_branch]).decode("utf-8")
+                    print(output)
+                    print("Congratulations, successfully {}d {}".format(merge_strategy, master_branch))
+                except CalledProcessError as e:
+                    if b"CONFLICT" in e.output:
+                        err = (
+                            e.output.decode()
+                            + " \n\nUnlucky! You have work to do. "
+                            + "Fix the above conflicts and run git pullrequest again"
+                        )  # noqa
+                        sys.exit(err)
+                    else:
+                        raise
 
     # check if there are any unpushed commits
-    commits = _call(["git", "log", "--oneline", branch, "^origin/" + branch])
+    commits = _summarize_commits([branch, "^origin/" + branch])
     if commits:
         print("You have unpushed commits:")
         print(commits)
@@ -561,7 +1364,7 @@ def pullrequest(args):
         if input().lower() == "y":
             _call(["git", "push", "origin", branch + ":" + branch])
 
-    origin = _call(["git", "config", "--get", "remote.origin.url"])
+    origin = _get_origin_url()
     print("origin", origin)
     name = _get_repo_full_name_from_origin_url(origin)
     print("name", name)
@@ -570,11 +1373,23 @@ def pullrequest(args):
     if (len(args) > 0 and args[0] == "--dry-run") or os.environ.get("CONSOLEONLY", False):  # noqa
         print(url)
     else:
-        # If a GitHub token is present, attempt to create the PR via API
-        token = os.environ.get("GITHUB_TOKEN") or os.environ.get("GH_TOKEN")
-        if repo == "github" and token:
+        # If an API token for the provider is present, attempt to create the PR via API
+        provider = _PR_PROVIDERS.get(repo)
+        token = provider["token"]() if provider else None
+        if token:
             body = _read_changelog_body(branch) if changelog_enabled else None
-            ok, resp = _create_github_pr_with_token(name, branch, master_branch, body, token)
+            op_args = {
+                "provider": repo,
+                "repo_full_name": name,
+                "head": branch,
+                "base": master_branch,
+                "body": body,
+            }
+            if defer_api:
+                _enqueue_api_operation("create_pr", op_args)
+                print("Queued PR creation, run git features sync to create it")
+                return
+            ok, resp = _create_pr_with_token(repo, name, branch, master_branch, body, token)
             if ok:
                 pr_url = resp.get("html_url") or url
                 print(f"Created PR: {pr_url}")
@@ -585,9 +1400,30 @@ def pullrequest(args):
                     except Exception:
                         pass
                 return
+            pr = None
+            if isinstance(resp, urllib.error.HTTPError) and resp.code in _PR_EXISTS_STATUSES and body:
+                pr = _find_open_pr_with_token(repo, name, branch, token)
+            if pr:
+                # The PR already exists; bring its description in line with the changelog
+                pr_url = pr.get("html_url") or url
+                print(f"PR already open: {pr_url}")
+                if (pr.get("body") or "").strip() != body.strip():
+                    try:
+                        provider["update_body"](name, pr, body, token)
+                        print("Updated PR body from the changelog")
+                    except Exception as e:
+                        print("Failed to update PR body from the changelog")
+                        _debug(f"{repo} API error: {e}")
+                webbrowser.open_new_tab(pr_url)
+                return
+            if _is_transient_api_error(resp):
+                # Don't wait on the API again now; sync retries it with backoff
+                _enqueue_api_operation("create_pr", op_args)
+                print("Failed to create PR via API, queued it for git features sync. Falling back to browser flow.")
             else:
                 print("Failed to create PR via API. Falling back to browser flow.")
-                _debug(f"GitHub API error: {resp}")
+            error = _read_http_error(resp) if isinstance(resp, urllib.error.HTTPError) else resp
+            _debug(f"{repo} API error: {error}")
         webbrowser.open_new_tab(url)
 
 
@@ -604,16 +1440,37 @@ def _get_pullrequest_url(name, branch):
 
 
 def _current_branch():
-    output = _call(["git", "branch"])
-    branch = re.search(r"^\* (.+)$", output, flags=re.M).group(1)
+    branch = _read_head_branch()
+    if branch is None:
+        output = _call(["git", "branch"])
+        branch = re.search(r"^\* (.+)$", output, flags=re.M).group(1)
     if not branch:
         sys.exit(__name__ + ": unable to detect current branch")
     else:
         return branch
 
 
+def _branch_list_from_refs() -> Optional[str]:
+    """
+    Render local and remote-tracking branches the way `git branch -a` lists them.
+    """
+    heads = _list_refs("refs/heads/")
+    remotes = _list_refs("refs/remotes/")
+    if heads is None or remotes is None:
+        return None
+    lines = [ref[len("refs/heads/") :] for ref in heads]
+    for ref, value in remotes.items():
+        line = "remotes/" + ref[len("refs/remotes/") :]
+        if value.startswith("ref: refs/remotes/"):
+            line += " -> " + value[len("ref: refs/remotes/") :]
+        lines.append(line)
+    return "\n".join(sorted(lines))
+
+
 def _branch_exists(name):
-    branch_list = _call(["git", "branch", "-a"])
+    branch_list = _branch_list_from_refs()
+    if branch_list is None:
+        branch_list = _call(["git", "branch", "-a"])
     return 1 if re.search(r"" + name + "$", branch_list, flags=re.M) else 0
 
 
@@ -621,15 +1478,25 @@ def _get_branches(branch_type):
     _call(["git", "remote", "update", "origin"])
     try:
         pattern = rf"/{branch_type}{branch_seperator}[0-9]{{8}}"
-        branch_list = (
-            check_output(
-                f"git branch -r | grep -E '{pattern}'",
-                shell=True,
+        remote_refs = _list_refs("refs/remotes/")
+        if remote_refs is not None:
+            branch_list = [
+                ref[len("refs/remotes/") :]
+                for ref, value in remote_refs.items()
+                if not value.startswith("ref: ") and re.search(pattern, ref)
+            ]
+            if not branch_list:
+                return []
+        else:
+            branch_list = (
+                check_output(
+                    f"git branch -r | grep -E '{pattern}'",
+                    shell=True,
+                )
+                .decode("utf-8")
+                .strip()
             )
-            .decode("utf-8")
-            .strip()
-        )
-        branch_list = branch_list.split("\n")
+            branch_list = branch_list.split("\n")
         branch_list = list(map(lambda it: it.split("/", 1)[1].strip(), branch_list))
         # Sort branches by embedded date (YYYYMMDD) and optional suffix (e.g. HHMMSS)
         date_regex = re.compile(
@@ -666,6 +1533,198 @@ def _name_has_embedded_ticket(candidate_name, prefix):
     return bool(pattern.match(rest))
 
 
+def _detect_ticket_identifier(rest: str) -> Optional[str]:
+    """
+    Return the normalized ticket id (e.g. 'ENG-123') a branch name starts with, once its
+    type prefix is removed, if GITFEATURES_TICKET_PREFIX/SEPERATOR are configured.
+    """
+    if not (ticket_seperator and ticket_prefix):
+        return None
+    pattern = re.compile(
+        r"^(" + re.escape(ticket_prefix) + r")(\d+)" + re.escape(ticket_seperator) + r"(.*)$",
+        re.IGNORECASE,
+    )
+    m = pattern.match(rest)
+    if m:
+        return f"{ticket_prefix}{m.group(2)}"
+    return None
+
+
+def _resolve_ref(refname: str) -> str:
+    """
+    Return the commit sha refname points at, following symbolic refs.
+    """
+    refs = _list_refs(refname.rsplit("/", 1)[0] + "/")
+    value = refs.get(refname) if refs is not None else None
+    if value and value.startswith("ref: "):
+        return _resolve_ref(value[len("ref: ") :])
+    if value:
+        return value
+    return _call(["git", "rev-parse", "--verify", refname]).strip()
+
+
+def _get_status_cache_path() -> str:
+    return os.path.join(_get_git_common_dir(), "gitfeatures", "status-cache.json")
+
+
+def _load_status_cache(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            cache = json.load(fh)
+        if isinstance(cache, dict):
+            return cache
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        _debug(f"Ignoring unreadable status cache {path}: {e}")
+    return {}
+
+
+def _save_status_cache(path: str, cache: Dict[str, Any]):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(cache, fh)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        _debug(f"Unable to write status cache {path}: {e}")
+
+
+def _compute_ahead_behind(base_sha: str, refs: Dict[str, str]) -> Dict[str, Tuple[int, int]]:
+    """
+    Return {refname: (ahead, behind)} relative to base_sha.
+    Uses a single for-each-ref walk over just those refs (git >= 2.41, which uses
+    commit-graph generation numbers when available), falling back to one rev-list per
+    ref on older git.
+    """
+    counts: Dict[str, Tuple[int, int]] = {}
+    try:
+        # Refs go through --stdin (also git >= 2.41) so long branch lists can't hit ARG_MAX;
+        # stderr is discarded so warnings can't end up in the parsed output
+        output = check_output(
+            ["git", "for-each-ref", "--stdin", f"--format=%(refname) %(ahead-behind:{base_sha})"],
+            input="\n".join(refs).encode("utf-8"),
+            stderr=DEVNULL,
+        ).decode("utf-8")
+        for line in output.splitlines():
+            ref, ahead, behind = line.rsplit(" ", 2)
+            if ref in refs:
+                counts[ref] = (int(ahead), int(behind))
+    except (CalledProcessError, ValueError) as e:
+        _debug(f"for-each-ref ahead-behind unavailable, counting per branch: {e}")
+        counts = {}
+    for ref, sha in refs.items():
+        if ref not in counts:
+            behind, ahead = _call(["git", "rev-list", "--left-right", "--count", f"{base_sha}...{sha}"]).split()
+            counts[ref] = (int(ahead), int(behind))
+    return counts
+
+
+def _get_linear_summaries(identifiers, cache: Dict[str, Any], refresh: bool) -> Dict[str, Dict[str, Any]]:
+    """
+    Return cached {identifier: {title, state, url}} for Linear tickets, fetching entries
+    that are missing or older than GITFEATURES_LINEAR_CACHE_TTL when a token is set.
+    """
+    linear_cache = cache.setdefault("linear", {})
+    now = time.time()
+    stale = [
+        ident
+        for ident in identifiers
+        if refresh or now - (linear_cache.get(ident) or {}).get("fetched_at", 0) > linear_cache_ttl
+    ]
+    linear_token = _get_linear_token()
+    if linear_token and stale:
+
+        def _fetch(ident):
+            parsed = _extract_linear_team_and_number(ident)
+            return ident, (_fetch_linear_issue(parsed[0], parsed[1], linear_token) if parsed else None)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for ident, issue in pool.map(_fetch, stale):
+                if issue:
+                    linear_cache[ident] = {
+                        "title": issue.get("title"),
+                        "state": (issue.get("state") or {}).get("name"),
+                        "url": issue.get("url"),
+                        "fetched_at": now,
+                    }
+    return {ident: linear_cache[ident] for ident in identifiers if ident in linear_cache}
+
+
+def list_features(prefix, args):
+    """
+    Show every local <prefix> branch with commits ahead/behind origin/<base> and ticket metadata.
+    Counts are cached per (base sha, branch sha) so unchanged branches are never recounted.
+    """
+    unknown = [a for a in args if a not in ("--json", "--refresh")]
+    if unknown:
+        sys.exit("Usage: git %s list [--json] [--refresh]" % prefix)
+    as_json = "--json" in args
+    refresh = "--refresh" in args
+
+    heads = _list_refs("refs/heads/")
+    if heads is None:
+        output = _call(["git", "for-each-ref", "--format=%(refname) %(objectname)", "refs/heads"])
+        heads = dict(line.rsplit(" ", 1) for line in output.splitlines())
+    branch_refs = {
+        ref: sha
+        for ref, sha in heads.items()
+        if ref[len("refs/heads/") :].startswith((prefix + branch_seperator, prefix + "/"))
+    }
+    base_sha = _resolve_ref(f"refs/remotes/origin/{master_branch}")
+
+    cache_path = _get_status_cache_path()
+    cache = _load_status_cache(cache_path)
+    cached_counts = cache.get("ahead_behind") or {}
+    counts: Dict[str, Tuple[int, int]] = {}
+    missing: Dict[str, str] = {}
+    for ref, sha in branch_refs.items():
+        key = f"{base_sha}:{sha}"
+        if key in cached_counts and not refresh:
+            counts[ref] = tuple(cached_counts[key])
+        else:
+            missing[ref] = sha
+    if missing:
+        counts.update(_compute_ahead_behind(base_sha, missing))
+    # Only keep entries for current branch tips so the cache stays bounded
+    cache["ahead_behind"] = {
+        f"{base_sha}:{sha}": list(counts[ref]) for ref, sha in branch_refs.items() if ref in counts
+    }
+
+    rows = []
+    for ref in sorted(branch_refs):
+        branch = ref[len("refs/heads/") :]
+        rest = branch.split("/", 1)[1] if branch.startswith(prefix + "/") else branch[len(prefix + branch_seperator) :]
+        ahead, behind = counts.get(ref, (None, None))
+        rows.append({"branch": branch, "ahead": ahead, "behind": behind, "ticket": _detect_ticket_identifier(rest)})
+    summaries = _get_linear_summaries(sorted({row["ticket"] for row in rows if row["ticket"]}), cache, refresh)
+    _save_status_cache(cache_path, cache)
+    for row in rows:
+        summary = summaries.get(row["ticket"]) or {}
+        row.update({"state": summary.get("state"), "title": summary.get("title"), "url": summary.get("url")})
+
+    if as_json:
+        print(json.dumps(rows, indent=2))
+        return
+    if not rows:
+        print(f"No {prefix} branches")
+        return
+    columns = [
+        ("branch", "BRANCH"),
+        ("ahead", "AHEAD"),
+        ("behind", "BEHIND"),
+        ("ticket", "TICKET"),
+        ("state", "STATE"),
+        ("title", "TITLE"),
+    ]
+    table = [[header for _key, header in columns]]
+    table += [["" if row[key] is None else str(row[key]) for key, _header in columns] for row in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+    for line in table:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip())
+
+
 def run(prefix, args):
     if len(args) and args[0].lower() == "new":
         allowed_branch_types = ["releasecandidate", "stable", "release", "hotfix"]
@@ -688,6 +1747,8 @@ def run(prefix, args):
             new_feature(args[1], prefix, ticket_id)
         else:
             sys.exit("Usage: git %s new <%s_name>" % (prefix, prefix))
+    elif len(args) and args[0].lower() == "list":
+        list_features(prefix, args[1:])
     elif len(args) and args[0].lower() == "finish":
         if len(args) == 1:
             finish_feature(None, prefix)
@@ -696,34 +1757,167 @@ def run(prefix, args):
         else:
             sys.exit("Usage: git %s finish [%s_name]" % (prefix, prefix))
     else:
-        sys.exit("Usage: git %s <new/finish> <%s_name>" % (prefix, prefix))
+        sys.exit("Usage: git %s <new/finish/list> <%s_name>" % (prefix, prefix))
+
+
+_subprocess_count = 0
+_subprocess_hook_installed = False
+
+
+def _count_subprocesses(event, args):
+    global _subprocess_count
+    if event == "subprocess.Popen":
+        _subprocess_count += 1
+
+
+def _install_subprocess_counter():
+    """
+    Count every subprocess started from now on in _subprocess_count.
+    """
+    global _subprocess_hook_installed
+    if not _subprocess_hook_installed:
+        # Audit hooks see every Popen, including check_output and shell pipelines. They
+        # can't be removed again, so only ever install one
+        sys.addaudithook(_count_subprocesses)
+        _subprocess_hook_installed = True
+
+
+def _profiled(func):
+    """
+    Wrap a cli_* entry point so it can be profiled and held to a budget.
+    With --profile (or GITFEATURES_PROFILE=<dir>) the command runs under cProfile and
+    the stats are written to <dir>/gitfeatures-<command>-<timestamp>.prof. Setting
+    GITFEATURES_SUBPROCESS_BUDGET or GITFEATURES_TIME_BUDGET (seconds) makes the
+    command exit non-zero when it spawns more processes or runs longer than that.
+    """
+
+    @functools.wraps(func)
+    def wrapper():
+        command = func.__name__[len("cli_") :]
+        profile_dir = os.environ.get("GITFEATURES_PROFILE", "").strip()
+        if profile_dir.lower() in ("0", "false", "no", "off"):
+            profile_dir = ""
+        if "--profile" in sys.argv[1:]:
+            sys.argv.remove("--profile")
+            profile_dir = profile_dir or "1"
+        if profile_dir.lower() in ("1", "true", "yes", "on"):
+            profile_dir = os.getcwd()
+        subprocess_budget = os.environ.get("GITFEATURES_SUBPROCESS_BUDGET")
+        time_budget = os.environ.get("GITFEATURES_TIME_BUDGET")
+        if not (profile_dir or subprocess_budget or time_budget):
+            return func()
+
+        _install_subprocess_counter()
+        count_before = _subprocess_count
+        profiler = cProfile.Profile() if profile_dir else None
+        started = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            result = func()
+        finally:
+            if profiler:
+                profiler.disable()
+            elapsed = time.perf_counter() - started
+            subprocesses = _subprocess_count - count_before
+            summary = f"[gitfeatures] {command}: {elapsed:.3f}s, {subprocesses} subprocesses"
+            if profiler:
+                os.makedirs(profile_dir, exist_ok=True)
+                stamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+                path = os.path.join(profile_dir, f"gitfeatures-{command}-{stamp}.prof")
+                profiler.dump_stats(path)
+                summary += f", profile written to {path}"
+            print(summary, file=sys.stderr)
+
+        over_budget = []
+        if subprocess_budget and subprocesses > int(subprocess_budget):
+            over_budget.append(f"{subprocesses} subprocesses (budget {subprocess_budget})")
+        if time_budget and elapsed > float(time_budget):
+            over_budget.append(f"{elapsed:.3f}s (budget {time_budget}s)")
+        if over_budget:
+            sys.exit(__name__ + f": {command} exceeded its budget: " + ", ".join(over_budget))
+        return result
+
+    return wrapper
 
 
 # Console script entry points for packaging
+@_profiled
 def cli_feature():
     return run("feature", sys.argv[1:])
 
 
+@_profiled
 def cli_hotfix():
     return hotfix(sys.argv[1:])
 
 
+@_profiled
 def cli_release():
     return release(sys.argv[1:])
 
 
+@_profiled
 def cli_stable():
     return stable(sys.argv[1:])
 
 
+@_profiled
 def cli_pullrequest():
     return pullrequest(sys.argv[1:])
 
 
+@_profiled
 def cli_releasecandidate():
     return run("releasecandidate", sys.argv[1:])
 
 
+def sync_outbox():
+    """
+    Replay queued API operations concurrently and record each outcome in the journal.
+    """
+    path = _get_outbox_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _file_lock(path + ".sync.lock", timeout=0):
+        pending = _read_outbox(path)
+        if not pending:
+            print("Nothing to sync")
+            return
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(_replay_api_operation, pending))
+        records = []
+        for entry, (status, message) in zip(pending, results):
+            print(f"{entry['op']}: {status}: {message}")
+            if status != "pending":
+                records.append({"id": entry["id"], "status": status, "message": message, "at": time.time()})
+        _append_outbox(path, records)
+        _compact_outbox(path)
+    remaining = len(pending) - len(records)
+    if remaining:
+        sys.exit(f"{remaining} operation(s) still pending, run git features sync again later")
+
+
+def list_outbox():
+    for entry in _read_outbox(_get_outbox_path()):
+        args = entry.get("args") or {}
+        queued_at = datetime.datetime.fromtimestamp(entry.get("queued_at", 0)).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{entry['id'][:8]}  {queued_at}  {entry['op']}  {args.get('head') or args.get('ticket') or ''}")
+
+
+def features(args):
+    if len(args) == 1 and args[0] == "sync":
+        sync_outbox()
+    elif len(args) == 1 and args[0] == "pending":
+        list_outbox()
+    else:
+        sys.exit("Usage: git features <sync/pending>")
+
+
+@_profiled
+def cli_features():
+    return features(sys.argv[1:])
+
+
 def _parse_args(args):
     """
     Minimal flag parser for preview commands.
@@ -732,8 +1926,9 @@ def _parse_args(args):
       --ticket <identifier>
       --write
       --out <path>
+      --check
     """
-    opts = {"branch": None, "ticket": None, "write": False, "out": None}
+    opts = {"branch": None, "ticket": None, "write": False, "out": None, "check": False}
     i = 0
     while i < len(args):
         a = args[i]
@@ -749,9 +1944,12 @@ def _parse_args(args):
         elif a == "--out" and i + 1 < len(args):
             opts["out"] = args[i + 1]
             i += 2
+        elif a == "--check":
+            opts["check"] = True
+            i += 1
         else:
             print(f"Unrecognized or incomplete option: {a}")
-            sys.exit("Usage: git-changelog [--branch <name>] [--ticket <id>] [--write] [--out <path>]")
+            sys.exit("Usage: git-changelog [--branch <name>] [--ticket <id>] [--write] [--out <path>] [--check]")
     return opts
 
 
@@ -772,31 +1970,39 @@ def preview_changelog(args):
             rest = branch.split("/", 1)[1]
         else:
             rest = branch
-        if ticket_seperator and ticket_prefix:
-            pattern = re.compile(
-                r"^(" + re.escape(ticket_prefix) + r")(\d+)" + re.escape(ticket_seperator) + r"(.*)$",
-                re.IGNORECASE,
-            )
-            m = pattern.match(rest)
-            if m:
-                number = m.group(2)
-                detected_ticket_identifier = f"{ticket_prefix}{number}"
+        detected_ticket_identifier = _detect_ticket_identifier(rest)
 
-    # Optional Linear fetch
-    linear_issue = None
-    linear_token = os.environ.get("LINEAR_API_KEY") or os.environ.get("LINEAR_TOKEN")
-    if linear_token and detected_ticket_identifier:
-        parsed = _extract_linear_team_and_number(detected_ticket_identifier)
-        if parsed:
-            team_key, number = parsed
-            linear_issue = _fetch_linear_issue(team_key, number, linear_token)
-
-    # Render from changelog template
     changelog_template = _read_changelog_template()
     if not changelog_template:
         sys.exit("No changelog template found. Provide GITFEATURES_CHANGELOG_TEMPLATE or add changelog-template.md.")
-    context = _build_changelog_context(branch, detected_ticket_identifier, linear_issue)
-    rendered = _render_changelog_template(changelog_template, context)
+    try:
+        template, variables = _compile_changelog_template(changelog_template)
+    except jinja2.TemplateSyntaxError as e:
+        sys.exit(f"Changelog template syntax error on line {e.lineno}: {e.message}")
+    except jinja2.TemplateError as e:
+        sys.exit(f"Changelog template error: {e}")
+
+    if opts["check"]:
+        # Trial render without network access; unknown names would silently render empty
+        context = _build_changelog_context(branch, detected_ticket_identifier, None, variables)
+        unknown = sorted(variables - set(context))
+        print("Variables used: " + (", ".join(sorted(variables)) or "none"))
+        if unknown:
+            sys.exit("Unknown template variables: " + ", ".join(unknown))
+        try:
+            template.render(**context)
+        except Exception as e:
+            sys.exit(f"Changelog template failed to render: {e}")
+        print("Changelog template OK")
+        return
+
+    # Optional Linear fetch, only if the template uses it
+    linear_issue = None
+    if variables & _LINEAR_CONTEXT_VARIABLES:
+        linear_issue = _fetch_linear_issue_for_ticket(detected_ticket_identifier)
+
+    context = _build_changelog_context(branch, detected_ticket_identifier, linear_issue, variables)
+    rendered = _render_changelog_template(template, context)
     if rendered is None:
         sys.exit("Failed to render changelog template.")
 
@@ -812,5 +2018,6 @@ def preview_changelog(args):
         print(rendered)
 
 
+@_profiled
 def cli_changelog():
     return preview_changelog(sys.argv[1:])
@@ -0,0 +1,153 @@
+import json
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from gitfeatures import core
+
+
+def git(cwd, *args):
+    return subprocess.check_output(["git", *args], cwd=str(cwd)).decode("utf-8")
+
+
+@pytest.fixture(autouse=True)
+def isolated_env(tmp_path_factory, monkeypatch):
+    """
+    Keep user/system git config and GITFEATURES_* settings out of the tests.
+    """
+    home = tmp_path_factory.mktemp("home")
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    for var in ("GIT_DIR", "GIT_WORK_TREE", "GIT_COMMON_DIR", "GIT_CEILING_DIRECTORIES"):
+        monkeypatch.delenv(var, raising=False)
+    for var in ("GITHUB_TOKEN", "GH_TOKEN", "LINEAR_API_KEY", "LINEAR_TOKEN", "CONSOLEONLY"):
+        monkeypatch.delenv(var, raising=False)
+    for var in ("BITBUCKET_TOKEN", "BITBUCKET_USERNAME", "BITBUCKET_APP_PASSWORD"):
+        monkeypatch.delenv(var, raising=False)
+    for var in ("GITFEATURES_PROFILE", "GITFEATURES_SUBPROCESS_BUDGET", "GITFEATURES_TIME_BUDGET"):
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv("GIT_AUTHOR_NAME", "Test")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "test@example.com")
+    monkeypatch.setenv("GIT_COMMITTER_NAME", "Test")
+    monkeypatch.setenv("GIT_COMMITTER_EMAIL", "test@example.com")
+    monkeypatch.setattr(core, "master_branch", "main")
+    monkeypatch.setattr(core, "branch_seperator", "_")
+    monkeypatch.setattr(core, "ticket_seperator", "_")
+    monkeypatch.setattr(core, "ticket_prefix", "")
+    monkeypatch.setattr(core, "repo", "github")
+    monkeypatch.setattr(core, "changelog_enabled", False)
+    monkeypatch.setattr(core, "read_git_directly", True)
+    monkeypatch.setattr(core, "use_worktrees", False)
+    monkeypatch.setattr(core, "defer_api", False)
+
+
+@pytest.fixture
+def fixture_repo(tmp_path):
+    """
+    A clone of a bare 'origin' with main, a few pushed feature branches (packed) and a
+    local-only branch (loose). Returns the path of the working copy.
+    """
+    origin = tmp_path / "origin.git"
+    work = tmp_path / "work"
+    git(tmp_path, "init", "-q", "--bare", "-b", "main", str(origin))
+    git(tmp_path, "init", "-q", "-b", "main", str(work))
+    git(work, "remote", "add", "origin", str(origin))
+    (work / "README").write_text("readme\n")
+    git(work, "add", "README")
+    git(work, "commit", "-q", "-m", "initial")
+    git(work, "push", "-q", "origin", "main")
+    for name in ("feature_one", "feature_two", "stable_20240101"):
+        git(work, "branch", name)
+        git(work, "push", "-q", "origin", name)
+    git(work, "tag", "-a", "v1", "-m", "release v1")
+    git(work, "remote", "set-head", "origin", "main")
+    git(work, "pack-refs", "--all")
+    git(work, "fetch", "-q", "origin")
+    git(work, "branch", "feature_local")
+    return work
+
+
+@pytest.fixture
+def github_repo(fixture_repo):
+    """
+    fixture_repo with a GitHub style origin URL that git rewrites to the local bare repo.
+    """
+    origin = fixture_repo.parent / "origin.git"
+    git(fixture_repo, "config", f"url.{origin}.insteadOf", "git@github.com:owner/repo.git")
+    git(fixture_repo, "remote", "set-url", "origin", "git@github.com:owner/repo.git")
+    return fixture_repo
+
+
+class FakeApi:
+    """
+    A local HTTP/1.1 server standing in for the GitHub and Bitbucket APIs. Responses are
+    queued per (method, path); the last one for a route is repeated. Every request is
+    recorded with the port it arrived from, so connection reuse can be checked.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.responses = {}
+        self.drop_after = set()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                path = self.path.split("?", 1)[0]
+                api.requests.append(
+                    {
+                        "method": self.command,
+                        "path": self.path,
+                        "headers": dict(self.headers),
+                        "json": json.loads(raw) if raw else None,
+                        "port": self.client_address[1],
+                    }
+                )
+                queue = api.responses.get((self.command, path)) or [(404, {"message": "Not Found"})]
+                status, body = queue.pop(0) if len(queue) > 1 else queue[0]
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                # Hang up without 'Connection: close', like a server timing out an idle connection
+                if len(api.requests) in api.drop_after:
+                    self.close_connection = True
+
+            do_GET = do_POST = do_PUT = do_PATCH = _handle
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True)
+
+    def respond(self, method, path, *responses):
+        self.responses[(method, path)] = list(responses)
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    api = FakeApi()
+    api.thread.start()
+    monkeypatch.setattr(core, "github_api_url", api.url)
+    monkeypatch.setattr(core, "bitbucket_api_url", api.url + "/2.0")
+    for var in ("http_proxy", "HTTP_PROXY", "https_proxy", "HTTPS_PROXY", "all_proxy", "ALL_PROXY"):
+        monkeypatch.delenv(var, raising=False)
+    pool = {}
+    monkeypatch.setattr(core._http_connections, "pool", pool, raising=False)
+    monkeypatch.setattr(core.time, "sleep", lambda seconds: None)
+    yield api
+    for conn in pool.values():
+        conn.close()
+    api.server.shutdown()
+    api.server.server_close()
@@ -0,0 +1,225 @@
+import base64
+
+import pytest
+
+from gitfeatures import core
+
+GITHUB_PULLS = "/repos/owner/repo/pulls"
+BITBUCKET_PULLS = "/2.0/repositories/owner/repo/pullrequests"
+
+
+@pytest.fixture
+def outbox_repo(fixture_repo, monkeypatch):
+    monkeypatch.chdir(fixture_repo)
+    return fixture_repo
+
+
+def _queue(op, provider, body="Changelog"):
+    args = {"provider": provider, "repo_full_name": "owner/repo", "head": "feature_one", "base": "main", "body": body}
+    return core._enqueue_api_operation(op, args)
+
+
+def _pending():
+    return core._read_outbox(core._get_outbox_path())
+
+
+def test_github_create(outbox_repo, fake_api, monkeypatch, capsys):
+    monkeypatch.setenv("GITHUB_TOKEN", "gh-token")
+    fake_api.respond("POST", GITHUB_PULLS, (201, {"number": 1, "html_url": "https://github.com/owner/repo/pull/1"}))
+    _queue("create_pr", "github")
+
+    core.sync_outbox()
+
+    [request] = fake_api.requests
+    assert (request["method"], request["path"]) == ("POST", GITHUB_PULLS)
+    assert request["headers"]["Authorization"] == "token gh-token"
+    assert request["json"] == {
+        "title": "feature_one",
+        "head": "feature_one",
+        "base": "main",
+        "draft": True,
+        "body": "Changelog",
+    }
+    assert "Created PR: https://github.com/owner/repo/pull/1" in capsys.readouterr().out
+    assert _pending() == []
+
+
+def test_bitbucket_create(outbox_repo, fake_api, monkeypatch, capsys):
+    monkeypatch.setenv("BITBUCKET_TOKEN", "bb-token")
+    pr = {"id": 2, "links": {"html": {"href": "https://bitbucket.org/owner/repo/pull-requests/2"}}}
+    fake_api.respond("POST", BITBUCKET_PULLS, (201, pr))
+    _queue("create_pr", "bitbucket")
+
+    core.sync_outbox()
+
+    [request] = fake_api.requests
+    assert (request["method"], request["path"]) == ("POST", BITBUCKET_PULLS)
+    assert request["json"] == {
+        "title": "feature_one",
+        "source": {"branch": {"name": "feature_one"}},
+        "destination": {"branch": {"name": "main"}},
+        "draft": True,
+        "description": "Changelog",
+    }
+    assert "Created PR: https://bitbucket.org/owner/repo/pull-requests/2" in capsys.readouterr().out
+    assert _pending() == []
+
+
+def test_github_existing_pr_updates_body(outbox_repo, fake_api, monkeypatch):
+    monkeypatch.setenv("GITHUB_TOKEN", "gh-token")
+    fake_api.respond("POST", GITHUB_PULLS, (422, {"message": "A pull request already exists"}))
+    fake_api.respond("GET", GITHUB_PULLS, (200, [{"number": 5, "title": "feature_one", "body": "Old"}]))
+    fake_api.respond("PATCH", GITHUB_PULLS + "/5", (200, {"number": 5}))
+    _queue("create_pr", "github")
+
+    core.sync_outbox()
+
+    assert [(r["method"], r["path"]) for r in fake_api.requests] == [
+        ("POST", GITHUB_PULLS),
+        ("GET", GITHUB_PULLS + "?head=owner%3Afeature_one&state=open"),
+        ("PATCH", GITHUB_PULLS + "/5"),
+    ]
+    assert fake_api.requests[-1]["json"] == {"body": "Changelog"}
+    assert _pending() == []
+
+
+def test_bitbucket_existing_pr_updates_body(outbox_repo, fake_api, monkeypatch):
+    monkeypatch.setenv("BITBUCKET_TOKEN", "bb-token")
+    fake_api.respond("POST", BITBUCKET_PULLS, (400, {"error": {"message": "already exists"}}))
+    open_pr = {"id": 6, "title": "feature_one", "description": "Old"}
+    fake_api.respond("GET", BITBUCKET_PULLS, (200, {"values": [open_pr]}))
+    fake_api.respond("PUT", BITBUCKET_PULLS + "/6", (200, open_pr))
+    _queue("create_pr", "bitbucket")
+
+    core.sync_outbox()
+
+    assert [r["method"] for r in fake_api.requests] == ["POST", "GET", "PUT"]
+    assert fake_api.requests[-1]["path"] == BITBUCKET_PULLS + "/6"
+    assert fake_api.requests[-1]["json"] == {"title": "feature_one", "description": "Changelog"}
+    assert _pending() == []
+
+
+@pytest.mark.parametrize(
+    "env, expected",
+    [
+        ({"BITBUCKET_TOKEN": "bb-token"}, "Bearer bb-token"),
+        (
+            {"BITBUCKET_USERNAME": "user", "BITBUCKET_APP_PASSWORD": "secret"},
+            "Basic " + base64.b64encode(b"user:secret").decode("ascii"),
+        ),
+    ],
+)
+def test_bitbucket_auth(outbox_repo, fake_api, monkeypatch, env, expected):
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    fake_api.respond("POST", BITBUCKET_PULLS, (201, {"id": 2}))
+    _queue("create_pr", "bitbucket")
+
+    core.sync_outbox()
+
+    assert fake_api.requests[0]["headers"]["Authorization"] == expected
+
+
+def test_server_error_stays_queued(outbox_repo, fake_api, monkeypatch):
+    monkeypatch.setenv("GITHUB_TOKEN", "gh-token")
+    fake_api.respond("POST", GITHUB_PULLS, (503, {"message": "Service Unavailable"}))
+    entry_id = _queue("create_pr", "github")
+
+    with pytest.raises(SystemExit) as exc:
+        core.sync_outbox()
+
+    assert "1 operation(s) still pending" in str(exc.value)
+    assert len(fake_api.requests) == core._OUTBOX_MAX_ATTEMPTS
+    assert [entry["id"] for entry in _pending()] == [entry_id]
+
+
+def test_client_error_is_dropped(outbox_repo, fake_api, monkeypatch):
+    monkeypatch.setenv("GITHUB_TOKEN", "gh-token")
+    fake_api.respond("POST", GITHUB_PULLS, (404, {"message": "Not Found"}))
+    _queue("create_pr", "github", body=None)
+
+    core.sync_outbox()
+
+    assert len(fake_api.requests) == 1
+    assert _pending() == []
+
+
+def test_requests_reuse_one_connection(fake_api):
+    fake_api.respond("GET", "/user", (200, {"login": "owner"}))
+
+    for _ in range(3):
+        assert core._github_request("GET", "/user", "gh-token") == {"login": "owner"}
+
+    assert len({r["port"] for r in fake_api.requests}) == 1
+
+
+def test_dropped_keep_alive_connection_is_retried(fake_api):
+    fake_api.respond("GET", "/user", (200, {"login": "owner"}))
+    fake_api.drop_after.add(1)
+
+    assert core._github_request("GET", "/user", "gh-token") == {"login": "owner"}
+    assert core._github_request("GET", "/user", "gh-token") == {"login": "owner"}
+
+    # The second request went out once, on a new connection
+    assert len(fake_api.requests) == 2
+    assert fake_api.requests[0]["port"] != fake_api.requests[1]["port"]
+
+
+@pytest.mark.parametrize("status", [301, 307])
+def test_redirect_is_not_success(outbox_repo, fake_api, status):
+    moved = {"message": "Moved Permanently", "url": fake_api.url + "/repositories/1/pulls"}
+    fake_api.respond("POST", GITHUB_PULLS, (status, moved))
+
+    ok, error = core._create_pr_with_token("github", "owner/repo", "feature_one", "main", None, "gh-token")
+
+    assert not ok
+    assert isinstance(error, core.urllib.error.HTTPError) and error.code == status
+
+
+def test_missing_token_stays_queued(outbox_repo, fake_api):
+    entry_id = _queue("create_pr", "github")
+
+    with pytest.raises(SystemExit):
+        core.sync_outbox()
+
+    assert fake_api.requests == []
+    assert [entry["id"] for entry in _pending()] == [entry_id]
+
+
+def test_malformed_entry_is_dropped(outbox_repo, fake_api, monkeypatch, capsys):
+    monkeypatch.setenv("GITHUB_TOKEN", "gh-token")
+    core._enqueue_api_operation("create_pr", {"provider": "github", "repo_full_name": "owner/repo"})
+
+    core.sync_outbox()
+
+    assert "create_pr: failed: KeyError" in capsys.readouterr().out
+    assert fake_api.requests == []
+    assert _pending() == []
+
+
+def test_broken_changelog_template_is_dropped(outbox_repo, monkeypatch, capsys):
+    monkeypatch.setenv("LINEAR_API_KEY", "lin-token")
+    monkeypatch.setattr(core, "_fetch_linear_issue_for_ticket", lambda ticket, raise_errors=False: {"title": "T"})
+    (outbox_repo / "changelog-template.md").write_text("{% if %}")
+    changelog = outbox_repo / "changelog.md"
+    changelog.write_text("rendered")
+    args = {"branch": "feature_one", "ticket": "ENG-1", "path": str(changelog), "rendered": "rendered"}
+    core._enqueue_api_operation("refresh_changelog", args)
+
+    core.sync_outbox()
+
+    assert "refresh_changelog: failed: TemplateSyntaxError" in capsys.readouterr().out
+    assert changelog.read_text() == "rendered"
+    assert _pending() == []
+
+
+def test_queued_body_update(outbox_repo, fake_api, monkeypatch):
+    monkeypatch.setenv("GITHUB_TOKEN", "gh-token")
+    fake_api.respond("GET", GITHUB_PULLS, (200, [{"number": 5, "title": "feature_one", "body": "Old"}]))
+    fake_api.respond("PATCH", GITHUB_PULLS + "/5", (200, {"number": 5}))
+    _queue("update_pr_body", "github")
+
+    core.sync_outbox()
+
+    assert [r["method"] for r in fake_api.requests] == ["GET", "PATCH"]
+    assert _pending() == []
@@ -0,0 +1,99 @@
+import pytest
+
+from gitfeatures import core
+
+from .conftest import git
+
+
+@pytest.fixture
+def template_repo(github_repo, monkeypatch):
+    monkeypatch.chdir(github_repo)
+
+    def write_template(text):
+        (github_repo / "changelog-template.md").write_text(text)
+
+    return write_template
+
+
+@pytest.fixture
+def linear_calls(monkeypatch):
+    calls = []
+
+    def fetch(ticket, raise_errors=False):
+        calls.append(ticket)
+        return None
+
+    monkeypatch.setattr(core, "_fetch_linear_issue_for_ticket", fetch)
+    return calls
+
+
+@pytest.mark.parametrize(
+    "text, message",
+    [
+        ("{% if branch %}unclosed", "Changelog template syntax error on line 1"),
+        ("{{ branch }} {{ nope }}", "Unknown template variables: nope"),
+        ("{{ linear.team.key.upper() }}", "Changelog template failed to render"),
+    ],
+)
+def test_check_rejects_broken_templates(template_repo, text, message):
+    template_repo(text)
+    with pytest.raises(SystemExit) as exc:
+        core.preview_changelog(["--check"])
+    assert message in str(exc.value)
+
+
+def test_check_accepts_bundled_template(template_repo, capsys):
+    core.preview_changelog(["--check"])
+    assert "Changelog template OK" in capsys.readouterr().out
+
+
+def test_new_feature_with_broken_template_creates_nothing(github_repo, template_repo, monkeypatch):
+    monkeypatch.setattr(core, "changelog_enabled", True)
+    template_repo("{% for %}")
+
+    with pytest.raises(SystemExit) as exc:
+        core.new_feature("thing", "feature")
+
+    assert "invalid changelog template" in str(exc.value)
+    assert git(github_repo, "rev-parse", "--abbrev-ref", "HEAD").strip() == "main"
+    assert "feature_thing" not in git(github_repo, "branch", "-a")
+    assert git(github_repo, "ls-remote", "origin", "feature_thing") == ""
+
+
+def test_context_skips_origin_lookup_when_unused(template_repo, monkeypatch):
+    calls = []
+    monkeypatch.setattr(core, "_get_origin_url", lambda: calls.append("origin") or "git@github.com:owner/repo.git")
+
+    context = core._build_changelog_context("feature_x", None, None, {"branch"})
+    assert calls == []
+    assert context["repo_full_name"] == ""
+
+    context = core._build_changelog_context("feature_x", None, None, {"repo_full_name"})
+    assert calls == ["origin"]
+    assert context["repo_full_name"] == "owner/repo"
+
+
+@pytest.mark.parametrize("text, fetched", [("# {{ branch }}", []), ("# {{ title }}", ["ENG-1"])])
+def test_new_feature_only_fetches_linear_when_used(
+    github_repo, template_repo, linear_calls, monkeypatch, text, fetched
+):
+    monkeypatch.setattr(core, "changelog_enabled", True)
+    template_repo(text)
+
+    core.new_feature("thing", "feature", "ENG-1")
+
+    assert linear_calls == fetched
+    assert (github_repo / "changelog" / "feature_ENG-1_thing.md").exists()
+
+
+@pytest.mark.parametrize("text, fetched", [("# {{ branch }}", []), ("# {{ linear.title }}", ["ENG-1"])])
+def test_preview_only_fetches_linear_when_used(template_repo, linear_calls, text, fetched):
+    template_repo(text)
+    core.preview_changelog(["--branch", "feature_ENG-1_thing", "--ticket", "ENG-1"])
+    assert linear_calls == fetched
+
+
+def test_check_never_fetches_linear(template_repo, linear_calls):
+    template_repo("# {{ title }} {{ linear.title }}")
+    core.preview_changelog(["--check", "--ticket", "ENG-1"])
+    assert linear_calls == []
@@ -0,0 +1,64 @@
+import signal
+
+import pytest
+
+from gitfeatures import core
+
+from .conftest import git
+
+
+@pytest.fixture
+def long_branch(fixture_repo, monkeypatch):
+    """
+    fixture_repo with feature_long, 25 commits ahead of main.
+    """
+    monkeypatch.chdir(fixture_repo)
+    git(fixture_repo, "checkout", "-q", "-b", "feature_long")
+    for i in range(25):
+        git(fixture_repo, "commit", "-q", "--allow-empty", "-m", f"change {i}")
+    git(fixture_repo, "checkout", "-q", "main")
+    return fixture_repo
+
+
+def test_long_range_is_truncated(long_branch):
+    summary = core._summarize_commits(["feature_long", "^main"]).splitlines()
+    expected = git(long_branch, "log", "--oneline", "feature_long", "^main").splitlines()
+    assert summary == expected[:20] + ["... and 5 more"]
+
+
+def test_range_at_the_limit_is_not_truncated(long_branch):
+    summary = core._summarize_commits(["feature_long", "^feature_long~20"])
+    assert summary == git(long_branch, "log", "--oneline", "feature_long", "^feature_long~20").strip()
+    assert len(summary.splitlines()) == 20
+
+
+def test_empty_range(long_branch):
+    assert core._summarize_commits(["main", "^feature_long"]) is None
+
+
+def test_closing_early_kills_git_log(long_branch, monkeypatch):
+    procs = []
+    real_popen = core.Popen
+
+    def popen(*args, **kwargs):
+        procs.append(real_popen(*args, **kwargs))
+        return procs[-1]
+
+    # A message far larger than a pipe buffer, so git log can't finish on its own
+    message = long_branch / "message.txt"
+    message.write_text("big change\n\n" + "line\n" * 100000)
+    git(long_branch, "commit", "-q", "--allow-empty", "-F", str(message))
+
+    monkeypatch.setattr(core, "Popen", popen)
+    output = core._call_lines(["git", "log", "--format=%B"])
+    assert next(output) == "big change"
+    output.close()
+
+    [proc] = procs
+    assert proc.returncode == -signal.SIGKILL
+
+
+def test_bad_revision_exits(long_branch):
+    with pytest.raises(SystemExit) as exc:
+        core._summarize_commits(["no_such_branch"])
+    assert "none zero exit status executing: git log --oneline no_such_branch" in str(exc.value)
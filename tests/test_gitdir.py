@@ -0,0 +1,137 @@
+import os
+
+import pytest
+
+from gitfeatures import core
+
+from .conftest import git
+
+
+def _git_branch_list(cwd):
+    lines = [line[2:].strip() for line in git(cwd, "branch", "-a").splitlines()]
+    return "\n".join(sorted(lines))
+
+
+def _for_each_ref(cwd, prefix):
+    output = git(cwd, "for-each-ref", "--format=%(refname) %(objectname)", prefix)
+    return dict(line.split(" ", 1) for line in output.splitlines())
+
+
+def test_packed_and_loose_refs_match_git(fixture_repo, monkeypatch):
+    monkeypatch.chdir(fixture_repo)
+    # feature_local is loose, the pushed branches are packed
+    assert os.path.exists(fixture_repo / ".git" / "refs" / "heads" / "feature_local")
+    assert "refs/heads/feature_one" in (fixture_repo / ".git" / "packed-refs").read_text()
+
+    assert core._branch_list_from_refs() == _git_branch_list(fixture_repo)
+    assert core._list_refs("refs/heads/") == _for_each_ref(fixture_repo, "refs/heads")
+    assert core._branch_exists("feature_local")
+    assert core._branch_exists("feature_one")
+    assert not core._branch_exists("feature_missing")
+
+
+def test_sorted_packed_refs_with_peeled_tags(fixture_repo, monkeypatch):
+    monkeypatch.chdir(fixture_repo)
+    packed = (fixture_repo / ".git" / "packed-refs").read_text()
+    assert packed.startswith("#") and " sorted" in packed.splitlines()[0]
+    assert any(line.startswith("^") for line in packed.splitlines())
+
+    assert core._list_refs("refs/tags/") == _for_each_ref(fixture_repo, "refs/tags")
+    # Symbolic refs are reported unresolved
+    expected_remotes = _for_each_ref(fixture_repo, "refs/remotes")
+    expected_remotes["refs/remotes/origin/HEAD"] = "ref: refs/remotes/origin/main"
+    assert core._list_refs("refs/remotes/") == expected_remotes
+
+
+def test_unsorted_packed_refs(fixture_repo, monkeypatch):
+    monkeypatch.chdir(fixture_repo)
+    packed = fixture_repo / ".git" / "packed-refs"
+    lines = packed.read_text().splitlines()
+    # Drop the 'sorted' trait and reverse the entries (keeping peeled lines after their ref)
+    entries = []
+    for line in lines[1:]:
+        if line.startswith("^"):
+            entries[-1] += "\n" + line
+        else:
+            entries.append(line)
+    packed.write_text("# pack-refs with: peeled\n" + "\n".join(reversed(entries)) + "\n")
+
+    assert core._list_refs("refs/heads/") == _for_each_ref(fixture_repo, "refs/heads")
+    assert core._list_refs("refs/tags/") == _for_each_ref(fixture_repo, "refs/tags")
+
+
+def test_current_branch_and_root_match_git(fixture_repo, monkeypatch):
+    monkeypatch.chdir(fixture_repo)
+    git(fixture_repo, "checkout", "-q", "feature_one")
+    assert core._current_branch() == "feature_one"
+    assert core._get_repo_root() == git(fixture_repo, "rev-parse", "--show-toplevel").strip()
+
+
+def test_subdirectory(fixture_repo, monkeypatch):
+    subdir = fixture_repo / "a" / "b"
+    subdir.mkdir(parents=True)
+    monkeypatch.chdir(subdir)
+    assert core._get_repo_root() == git(subdir, "rev-parse", "--show-toplevel").strip()
+    assert core._current_branch() == "main"
+    assert core._branch_list_from_refs() == _git_branch_list(subdir)
+
+
+def test_linked_worktree(fixture_repo, tmp_path, monkeypatch):
+    worktree = tmp_path / "linked"
+    git(fixture_repo, "worktree", "add", "-q", "-b", "feature_wt", str(worktree))
+    monkeypatch.chdir(worktree)
+
+    root, git_dir, common_dir = core._find_git_dirs()
+    assert root == git(worktree, "rev-parse", "--show-toplevel").strip()
+    assert common_dir == os.path.realpath(git(worktree, "rev-parse", "--git-common-dir").strip())
+    assert git_dir != common_dir
+    assert core._current_branch() == "feature_wt"
+    assert core._branch_list_from_refs() == _git_branch_list(worktree)
+    assert core._get_origin_url() == git(worktree, "config", "--get", "remote.origin.url").strip()
+
+
+def test_origin_url_matches_git_config(fixture_repo, monkeypatch):
+    monkeypatch.chdir(fixture_repo)
+    expected = git(fixture_repo, "config", "--get", "remote.origin.url").strip()
+    assert core._read_git_config("remote.origin.url") == expected
+    assert core._get_origin_url() == expected
+
+
+def test_config_include_falls_back_to_git(fixture_repo, monkeypatch):
+    monkeypatch.chdir(fixture_repo)
+    (fixture_repo / ".git" / "extra.config").write_text('[remote "origin"]\n\turl = https://example.com/o/r.git\n')
+    with open(fixture_repo / ".git" / "config", "a") as fh:
+        fh.write("[include]\n\tpath = extra.config\n")
+
+    assert core._read_git_config("remote.origin.url") is None
+    assert core._get_origin_url() == git(fixture_repo, "config", "--get", "remote.origin.url").strip()
+    assert core._get_origin_url() == "https://example.com/o/r.git"
+
+
+def test_config_quoted_value_falls_back_to_git(fixture_repo, monkeypatch):
+    monkeypatch.chdir(fixture_repo)
+    config = fixture_repo / ".git" / "config"
+    text = config.read_text()
+    url = git(fixture_repo, "config", "--get", "remote.origin.url").strip()
+    config.write_text(text.replace(f"url = {url}", 'url = "git@example.com:o/r.git" ; comment'))
+
+    assert core._read_git_config("remote.origin.url") is None
+    assert core._get_origin_url() == git(fixture_repo, "config", "--get", "remote.origin.url").strip()
+    assert core._get_origin_url() == "git@example.com:o/r.git"
+
+
+@pytest.mark.parametrize("value", ["git@github.com:o/r.git", "https://github.com/o/r.git"])
+def test_config_comments_and_case(fixture_repo, monkeypatch, value):
+    monkeypatch.chdir(fixture_repo)
+    config = fixture_repo / ".git" / "config"
+    config.write_text(config.read_text() + f'# comment\n[Remote "upstream"] ; trailing\n\tURL = {value} # inline\n')
+    expected = git(fixture_repo, "config", "--get", "remote.upstream.url").strip()
+    assert core._read_git_config("remote.upstream.url") == expected
+
+
+def test_disabled_reader_uses_git(fixture_repo, monkeypatch):
+    monkeypatch.chdir(fixture_repo)
+    monkeypatch.setattr(core, "read_git_directly", False)
+    assert core._find_git_dirs() is None
+    assert core._current_branch() == "main"
+    assert core._branch_exists("feature_local")
@@ -0,0 +1,55 @@
+from subprocess import DEVNULL
+
+from gitfeatures import core
+
+from .conftest import git
+
+
+def _diverge(repo):
+    git(repo, "checkout", "-q", "feature_one")
+    (repo / "one.txt").write_text("one\n")
+    git(repo, "add", "one.txt")
+    git(repo, "commit", "-q", "-m", "feature one")
+    git(repo, "checkout", "-q", "main")
+
+
+def _rev_list_counts(repo, base, ref):
+    behind, ahead = git(repo, "rev-list", "--left-right", "--count", f"{base}...{ref}").split()
+    return int(ahead), int(behind)
+
+
+def test_ahead_behind_matches_rev_list(fixture_repo, monkeypatch):
+    monkeypatch.chdir(fixture_repo)
+    _diverge(fixture_repo)
+    base = git(fixture_repo, "rev-parse", "origin/main").strip()
+    refs = {ref: git(fixture_repo, "rev-parse", ref).strip() for ref in ("refs/heads/feature_one", "refs/heads/main")}
+
+    counts = core._compute_ahead_behind(base, refs)
+    assert counts == {ref: _rev_list_counts(fixture_repo, base, ref) for ref in refs}
+    assert counts["refs/heads/feature_one"] == (1, 0)
+
+
+def test_ahead_behind_only_asks_for_missing_refs(fixture_repo, monkeypatch):
+    monkeypatch.chdir(fixture_repo)
+    _diverge(fixture_repo)
+    base = git(fixture_repo, "rev-parse", "origin/main").strip()
+    refs = {ref: git(fixture_repo, "rev-parse", ref).strip() for ref in ("refs/heads/feature_one", "refs/heads/main")}
+    calls = []
+    real_check_output = core.check_output
+
+    def fake_check_output(args, **kwargs):
+        calls.append((args, kwargs))
+        if args[:2] == ["git", "for-each-ref"]:
+            # git only answers for one of the refs; the other must still be counted
+            return b"refs/heads/feature_one 1 0\n"
+        return real_check_output(args, **kwargs)
+
+    monkeypatch.setattr(core, "check_output", fake_check_output)
+    counts = core._compute_ahead_behind(base, refs)
+
+    args, kwargs = calls[0]
+    assert "--stdin" in args and not any(arg.startswith("refs/") for arg in args)
+    assert kwargs["input"].decode("utf-8").splitlines() == sorted(refs)
+    assert kwargs["stderr"] is DEVNULL
+    assert counts == {"refs/heads/feature_one": (1, 0), "refs/heads/main": (0, 0)}
+    assert len(calls) == 2
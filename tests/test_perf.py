@@ -0,0 +1,69 @@
+"""
+Subprocess and wall time budgets per command, enforced by the same audit hook and
+GITFEATURES_*_BUDGET settings as --profile. A new git call on a hot path should fail
+here rather than slip in unnoticed. Time budgets are generous; they catch a command
+that starts waiting on something, not a few milliseconds of drift.
+"""
+
+import re
+import time
+
+import pytest
+
+from gitfeatures import core
+
+from .conftest import git
+
+
+@pytest.fixture
+def run_within_budget(github_repo, monkeypatch):
+    """
+    Run a cli_* entry point with both budgets set, and check that it spawned exactly the
+    expected number of subprocesses and finished within the time budget.
+    """
+    monkeypatch.chdir(github_repo)
+    core._install_subprocess_counter()
+
+    def run(cli, args, subprocesses, seconds):
+        monkeypatch.setattr(core.sys, "argv", ["git-" + cli.__name__[len("cli_") :], *args])
+        monkeypatch.setenv("GITFEATURES_SUBPROCESS_BUDGET", str(subprocesses))
+        monkeypatch.setenv("GITFEATURES_TIME_BUDGET", str(seconds))
+        before = core._subprocess_count
+        started = time.perf_counter()
+        cli()
+        assert time.perf_counter() - started < seconds
+        assert core._subprocess_count - before == subprocesses
+
+    return run
+
+
+def _git_has_ahead_behind(repo):
+    version = re.search(r"(\d+)\.(\d+)", git(repo, "--version"))
+    return (int(version.group(1)), int(version.group(2))) >= (2, 41)
+
+
+def test_pullrequest_dry_run(github_repo, run_within_budget):
+    git(github_repo, "checkout", "-q", "feature_one")
+    # remote update, behind check, unpushed check
+    run_within_budget(core.cli_pullrequest, ["--dry-run"], subprocesses=3, seconds=5)
+
+
+def test_feature_list(github_repo, run_within_budget):
+    branches = 3  # feature_one, feature_two, feature_local
+    fast = _git_has_ahead_behind(github_repo)
+    run_within_budget(core.cli_feature, ["list"], subprocesses=1 if fast else 1 + branches, seconds=5)
+    run_within_budget(core.cli_feature, ["list"], subprocesses=0, seconds=2)
+    # Only a moved branch is counted again
+    git(github_repo, "commit", "-q", "--allow-empty", "-m", "more")
+    git(github_repo, "branch", "-f", "feature_local", "HEAD")
+    run_within_budget(core.cli_feature, ["list"], subprocesses=1 if fast else 2, seconds=5)
+
+
+def test_changelog_check(github_repo, run_within_budget):
+    run_within_budget(core.cli_changelog, ["--check"], subprocesses=0, seconds=2)
+
+
+def test_feature_finish(github_repo, run_within_budget):
+    # remote update, merged check, delete the remote branch, delete the local branch
+    run_within_budget(core.cli_feature, ["finish", "two"], subprocesses=4, seconds=5)
+    assert "feature_two" not in git(github_repo, "branch", "-a")
@@ -0,0 +1,78 @@
+import subprocess
+import time
+
+import pytest
+
+from gitfeatures import core
+
+
+@pytest.fixture
+def profiled(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(core.sys, "argv", ["git-feature"])
+
+    @core._profiled
+    def cli_noop():
+        return "done"
+
+    return cli_noop
+
+
+@pytest.mark.parametrize("value", ["", "0", "false", "False", "no", "off", " off "])
+def test_disabled_values_do_not_profile(profiled, monkeypatch, tmp_path, capsys, value):
+    monkeypatch.setenv("GITFEATURES_PROFILE", value)
+    assert profiled() == "done"
+    assert list(tmp_path.iterdir()) == []
+    assert capsys.readouterr().err == ""
+
+
+def test_profile_flag_overrides_disabled_env(profiled, monkeypatch, tmp_path, capsys):
+    monkeypatch.setenv("GITFEATURES_PROFILE", "off")
+    monkeypatch.setattr(core.sys, "argv", ["git-feature", "--profile"])
+    assert profiled() == "done"
+    assert core.sys.argv == ["git-feature"]
+    assert [p.name.startswith("gitfeatures-noop-") for p in tmp_path.iterdir()] == [True]
+    assert "[gitfeatures] noop:" in capsys.readouterr().err
+
+
+def test_profile_directory(profiled, monkeypatch, tmp_path):
+    monkeypatch.setenv("GITFEATURES_PROFILE", str(tmp_path / "profiles"))
+    profiled()
+    assert len(list((tmp_path / "profiles").iterdir())) == 1
+
+
+@pytest.fixture
+def busy(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(core.sys, "argv", ["git-feature"])
+
+    @core._profiled
+    def cli_busy():
+        subprocess.check_output(["git", "--version"])
+        subprocess.check_output(["git", "--version"])
+        time.sleep(0.05)
+
+    return cli_busy
+
+
+@pytest.mark.parametrize(
+    "env, message",
+    [
+        ({"GITFEATURES_SUBPROCESS_BUDGET": "1"}, "2 subprocesses (budget 1)"),
+        ({"GITFEATURES_TIME_BUDGET": "0.01"}, "(budget 0.01s)"),
+    ],
+)
+def test_over_budget_exits(busy, monkeypatch, env, message):
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    with pytest.raises(SystemExit) as exc:
+        busy()
+    assert "busy exceeded its budget" in str(exc.value)
+    assert message in str(exc.value)
+
+
+def test_within_budget(busy, monkeypatch, capsys):
+    monkeypatch.setenv("GITFEATURES_SUBPROCESS_BUDGET", "2")
+    monkeypatch.setenv("GITFEATURES_TIME_BUDGET", "30")
+    busy()
+    assert "[gitfeatures] busy:" in capsys.readouterr().err
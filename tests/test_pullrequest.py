@@ -0,0 +1,119 @@
+import io
+
+import pytest
+
+from gitfeatures import core
+
+from .conftest import git
+
+
+@pytest.fixture
+def pr_branch(github_repo, monkeypatch):
+    """
+    Check out the pushed, up to date feature_one with a changelog, with the API mocked.
+    """
+    git(github_repo, "checkout", "-q", "feature_one")
+    (github_repo / "changelog").mkdir()
+    (github_repo / "changelog" / "feature_one.md").write_text("New changelog\n")
+    monkeypatch.chdir(github_repo)
+    monkeypatch.setattr(core, "changelog_enabled", True)
+    monkeypatch.setenv("GITHUB_TOKEN", "token")
+    opened = []
+    monkeypatch.setattr(core.webbrowser, "open_new_tab", opened.append)
+    return opened
+
+
+def _http_error(code):
+    return core.urllib.error.HTTPError("https://api.github.com", code, "error", {}, io.BytesIO(b"{}"))
+
+
+def _provider(monkeypatch, create_error, open_pr=None):
+    calls = []
+
+    def create(repo_full_name, head_branch, base_branch, body_text, token):
+        calls.append(("create", repo_full_name, head_branch, body_text))
+        raise create_error
+
+    def find_open(repo_full_name, head_branch, token):
+        calls.append(("find_open", repo_full_name, head_branch))
+        return open_pr
+
+    def update_body(repo_full_name, pr, body_text, token):
+        calls.append(("update_body", repo_full_name, pr["id"], body_text))
+
+    provider = dict(core._PR_PROVIDERS["github"], create=create, find_open=find_open, update_body=update_body)
+    monkeypatch.setitem(core._PR_PROVIDERS, "github", provider)
+    return calls
+
+
+def _queued():
+    return [(entry["op"], entry["args"]) for entry in core._read_outbox(core._get_outbox_path())]
+
+
+def test_existing_pr_with_stale_body_is_updated(pr_branch, monkeypatch, capsys):
+    pr = {"id": 7, "body": "Old changelog", "html_url": "https://github.com/owner/repo/pull/7"}
+    calls = _provider(monkeypatch, _http_error(422), pr)
+
+    core.pullrequest([])
+
+    assert calls == [
+        ("create", "owner/repo", "feature_one", "New changelog\n"),
+        ("find_open", "owner/repo", "feature_one"),
+        ("update_body", "owner/repo", 7, "New changelog\n"),
+    ]
+    assert pr_branch == ["https://github.com/owner/repo/pull/7"]
+    assert _queued() == []
+    assert "Updated PR body from the changelog" in capsys.readouterr().out
+
+
+def test_existing_pr_with_current_body_is_left_alone(pr_branch, monkeypatch):
+    pr = {"id": 7, "body": "New changelog", "html_url": "https://github.com/owner/repo/pull/7"}
+    calls = _provider(monkeypatch, _http_error(422), pr)
+
+    core.pullrequest([])
+
+    assert [call[0] for call in calls] == ["create", "find_open"]
+    assert pr_branch == ["https://github.com/owner/repo/pull/7"]
+    assert _queued() == []
+
+
+def test_rejected_create_without_open_pr_falls_back_to_browser(pr_branch, monkeypatch):
+    calls = _provider(monkeypatch, _http_error(422))
+
+    core.pullrequest([])
+
+    assert [call[0] for call in calls] == ["create", "find_open"]
+    assert pr_branch == ["https://github.com/owner/repo/pull/new/feature_one"]
+    assert _queued() == []
+
+
+@pytest.mark.parametrize("error", [_http_error(503), core.urllib.error.URLError("timed out")])
+def test_transient_error_queues_create_without_lookup(pr_branch, monkeypatch, error):
+    calls = _provider(monkeypatch, error)
+
+    core.pullrequest([])
+
+    assert [call[0] for call in calls] == ["create"]
+    assert pr_branch == ["https://github.com/owner/repo/pull/new/feature_one"]
+    assert _queued() == [
+        (
+            "create_pr",
+            {
+                "provider": "github",
+                "repo_full_name": "owner/repo",
+                "head": "feature_one",
+                "base": "main",
+                "body": "New changelog\n",
+            },
+        )
+    ]
+
+
+def test_permanent_error_falls_back_to_browser(pr_branch, monkeypatch):
+    calls = _provider(monkeypatch, _http_error(403))
+
+    core.pullrequest([])
+
+    assert [call[0] for call in calls] == ["create"]
+    assert pr_branch == ["https://github.com/owner/repo/pull/new/feature_one"]
+    assert _queued() == []
@@ -0,0 +1,101 @@
+import os
+import stat
+from subprocess import CalledProcessError
+
+import pytest
+
+from gitfeatures import core
+
+from .conftest import git
+
+
+@pytest.fixture
+def behind_repo(fixture_repo, tmp_path, monkeypatch):
+    """
+    fixture_repo with a commit on origin/main that feature_one and feature_two don't have.
+    """
+    other = tmp_path / "other"
+    git(tmp_path, "clone", "-q", str(tmp_path / "origin.git"), str(other))
+    (other / "upstream.txt").write_text("upstream\n")
+    git(other, "add", "upstream.txt")
+    git(other, "commit", "-q", "-m", "upstream change")
+    git(other, "push", "-q", "origin", "main")
+    git(fixture_repo, "fetch", "-q", "origin")
+    # pullrequest runs from the feature branch, so main isn't checked out
+    git(fixture_repo, "checkout", "-q", "feature_one")
+    monkeypatch.chdir(fixture_repo)
+    monkeypatch.setattr(core, "use_worktrees", True)
+    assert core._update_master_ref()
+    return fixture_repo
+
+
+def _pool_entries(repo):
+    return sorted(os.listdir(repo / ".git" / "gitfeatures" / "worktrees"))
+
+
+def _is_ancestor(repo, ancestor, rev):
+    try:
+        git(repo, "merge-base", "--is-ancestor", ancestor, rev)
+        return True
+    except CalledProcessError:
+        return False
+
+
+@pytest.mark.parametrize("strategy", ["merge", "rebase"])
+def test_branches_share_one_worktree(behind_repo, monkeypatch, strategy):
+    monkeypatch.setattr(core, "merge_strategy", strategy)
+    for branch in ("feature_one", "feature_two"):
+        git(behind_repo, "checkout", "-q", branch)
+        assert core._update_branch_in_worktree(branch)
+        assert _is_ancestor(behind_repo, "origin/main", branch)
+
+    assert _pool_entries(behind_repo) == ["pool-0"]
+    assert len(git(behind_repo, "worktree", "list").splitlines()) == 2
+
+
+def test_busy_slot_uses_next_worktree(behind_repo):
+    pool_dir = behind_repo / ".git" / "gitfeatures" / "worktrees"
+    pool_dir.mkdir(parents=True)
+    (pool_dir / "pool-0.lock").write_text("")
+    git(behind_repo, "checkout", "-q", "feature_one")
+    assert core._update_branch_in_worktree("feature_one")
+    assert _pool_entries(behind_repo) == ["pool-0.lock", "pool-1"]
+
+
+def test_slots_beyond_pool_size_are_pruned(behind_repo, monkeypatch):
+    pool_dir = behind_repo / ".git" / "gitfeatures" / "worktrees"
+    git(behind_repo, "worktree", "add", "-q", "--detach", str(pool_dir / "pool-5"), "main")
+    git(behind_repo, "checkout", "-q", "feature_one")
+    assert core._update_branch_in_worktree("feature_one")
+    assert _pool_entries(behind_repo) == ["pool-0"]
+
+
+def test_conflict_aborts_in_worktree(behind_repo):
+    git(behind_repo, "checkout", "-q", "feature_one")
+    (behind_repo / "upstream.txt").write_text("mine\n")
+    git(behind_repo, "add", "upstream.txt")
+    git(behind_repo, "commit", "-q", "-m", "conflicting change")
+    head = git(behind_repo, "rev-parse", "feature_one")
+
+    assert not core._update_branch_in_worktree("feature_one")
+    assert git(behind_repo, "rev-parse", "feature_one") == head
+    pool = behind_repo / ".git" / "gitfeatures" / "worktrees" / "pool-0"
+    assert git(pool, "status", "--porcelain") == ""
+
+
+def test_failure_without_conflicts_aborts_before_raising(behind_repo):
+    hook = behind_repo / ".git" / "hooks" / "pre-merge-commit"
+    hook.write_text("#!/bin/sh\nexit 1\n")
+    hook.chmod(hook.stat().st_mode | stat.S_IEXEC)
+    # Diverge so a merge commit (and the failing hook) is needed
+    (behind_repo / "feature.txt").write_text("feature\n")
+    git(behind_repo, "add", "feature.txt")
+    git(behind_repo, "commit", "-q", "-m", "feature change")
+    head = git(behind_repo, "rev-parse", "feature_one")
+
+    with pytest.raises(CalledProcessError):
+        core._update_branch_in_worktree("feature_one")
+    assert git(behind_repo, "rev-parse", "feature_one") == head
+    pool = behind_repo / ".git" / "gitfeatures" / "worktrees" / "pool-0"
+    assert not os.path.exists(git(pool, "rev-parse", "--git-path", "MERGE_HEAD").strip())
+    assert _pool_entries(behind_repo) == ["pool-0"]